@@ -0,0 +1,266 @@
+"""
+Almacén de backups deduplicado y direccionado por contenido
+
+Cada documento se guarda una sola vez como blob comprimido bajo el SHA-256 de
+su JSON canónico. Un snapshot es solo un manifiesto con pares (_id, hash), así
+que tomar snapshots frecuentes de una colección que cambia poco casi no ocupa
+espacio adicional.
+
+created_at y updated_at se reescriben en cada carga aunque el producto no
+cambie, así que quedan fuera del blob y del hash: se guardan en la línea del
+manifiesto y se reincorporan al reconstruir el documento.
+
+Estructura en disco:
+    <root>/blobs/ab/abcdef....json.gz
+    <root>/snapshots/<colección>_<YYYYmmdd>_<HHMMSS>.manifest.gz
+
+El manifiesto es JSONL comprimido: la primera línea es {"backup_info": {...}}
+y cada línea siguiente es [_id, hash] o [_id, hash, {campos volátiles}],
+ordenada por _id.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_DIR = os.path.join('backups', 'store')
+
+# Campos que cambian en cada carga y no forman parte del contenido del producto
+VOLATILE_FIELDS = ('created_at', 'updated_at')
+
+_MANIFEST_RE = re.compile(r'^(?P<collection>.+)_(?P<timestamp>\d{8}_\d{6})\.manifest\.gz$')
+
+
+def canonical_json(doc: Dict[str, Any]) -> bytes:
+    """JSON canónico (claves ordenadas, sin espacios) usado para el hash"""
+    return json.dumps(doc, sort_keys=True, ensure_ascii=False, separators=(',', ':'),
+                      default=str).encode('utf-8')
+
+
+def split_volatile(doc: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Separar (contenido, campos volátiles) de un documento"""
+    if not any(field in doc for field in VOLATILE_FIELDS):
+        return doc, {}
+    content = {k: v for k, v in doc.items() if k not in VOLATILE_FIELDS}
+    volatile = {k: doc[k] for k in VOLATILE_FIELDS if k in doc}
+    return content, volatile
+
+
+def document_hash(doc: Dict[str, Any]) -> str:
+    """Hash del contenido del documento, sin los campos volátiles"""
+    return hashlib.sha256(canonical_json(split_volatile(doc)[0])).hexdigest()
+
+
+class BackupStore:
+    """
+    Almacén de blobs por hash y manifiestos de snapshot
+    """
+
+    def __init__(self, root: str = DEFAULT_STORE_DIR):
+        self.root = Path(root)
+        self.blobs_dir = self.root / 'blobs'
+        self.snapshots_dir = self.root / 'snapshots'
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshots_dir.mkdir(parents=True, exist_ok=True)
+
+    def _blob_path(self, doc_hash: str) -> Path:
+        return self.blobs_dir / doc_hash[:2] / f"{doc_hash}.json.gz"
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def put_document(self, doc: Dict[str, Any]) -> Tuple[str, bool]:
+        """
+        Guardar el contenido de un documento (sin campos volátiles) si aún no existe
+
+        Returns:
+            (hash, True si se escribió un blob nuevo)
+        """
+        data = canonical_json(split_volatile(doc)[0])
+        doc_hash = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(doc_hash)
+        if path.exists():
+            return doc_hash, False
+        self._atomic_write(path, gzip.compress(data, compresslevel=6))
+        return doc_hash, True
+
+    def get_document(self, doc_hash: str) -> Dict[str, Any]:
+        with gzip.open(self._blob_path(doc_hash), 'rb') as f:
+            return json.loads(f.read())
+
+    def snapshot(self, collection_name: str, documents: Iterable[Dict[str, Any]],
+                 backup_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Crear un snapshot a partir de documentos ya convertidos a JSON
+
+        Las entradas del manifiesto se ordenan por _id para que dos snapshots
+        puedan compararse con un merge (ver snapshot_diff).
+
+        Returns:
+            Dict con ruta del manifiesto, total de documentos y blobs nuevos
+        """
+        timestamp = datetime.now()
+        manifest_path = self.snapshots_dir / f"{collection_name}_{timestamp.strftime('%Y%m%d_%H%M%S')}.manifest.gz"
+        # Dos snapshots en el mismo segundo no deben pisarse
+        while manifest_path.exists():
+            timestamp += timedelta(seconds=1)
+            manifest_path = self.snapshots_dir / f"{collection_name}_{timestamp.strftime('%Y%m%d_%H%M%S')}.manifest.gz"
+        tmp_path = manifest_path.with_suffix('.tmp')
+
+        total = 0
+        new_blobs = 0
+        new_bytes = 0
+        entries: List[Tuple[Any, ...]] = []
+        for doc in documents:
+            doc_hash, created = self.put_document(doc)
+            if created:
+                new_blobs += 1
+                new_bytes += self._blob_path(doc_hash).stat().st_size
+            volatile = split_volatile(doc)[1]
+            doc_id = str(doc.get('_id'))
+            entries.append((doc_id, doc_hash, volatile) if volatile else (doc_id, doc_hash))
+            total += 1
+
+        info = dict(backup_info or {})
+        info.update({
+            "collection_name": collection_name,
+            "backup_date": timestamp.isoformat(),
+            "total_documents": total,
+            "format": "content-addressed"
+        })
+
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({"backup_info": info}, ensure_ascii=False) + '\n')
+            for entry in sorted(entries, key=lambda e: e[0]):
+                f.write(json.dumps(list(entry), ensure_ascii=False, default=str) + '\n')
+        os.replace(tmp_path, manifest_path)
+
+        logger.info(f"✅ Snapshot {manifest_path.name}: {total} documents, {new_blobs} new blobs ({new_bytes / 1024:.1f} KB)")
+        return {
+            "manifest": str(manifest_path),
+            "total_documents": total,
+            "new_blobs": new_blobs,
+            "new_bytes": new_bytes
+        }
+
+    def list_snapshots(self, collection_name: Optional[str] = None) -> List[Path]:
+        """
+        Manifiestos ordenados del más antiguo al más reciente
+
+        El nombre debe ser exactamente <colección>_<YYYYmmdd>_<HHMMSS>, para que
+        'products' no incluya los de 'products_archive'.
+        """
+        snapshots = []
+        for path in self.snapshots_dir.glob('*.manifest.gz'):
+            match = _MANIFEST_RE.match(path.name)
+            if match and (collection_name is None or match.group('collection') == collection_name):
+                snapshots.append((match.group('timestamp'), path))
+        return [path for _, path in sorted(snapshots)]
+
+    @staticmethod
+    def _read_manifest_lines(manifest_path: str) -> Tuple[Dict[str, Any], Iterator[List[Any]]]:
+        f = gzip.open(manifest_path, 'rt', encoding='utf-8')
+        header = json.loads(f.readline())
+
+        def lines():
+            with f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+        return header["backup_info"], lines()
+
+    @classmethod
+    def read_manifest(cls, manifest_path: str) -> Tuple[Dict[str, Any], Iterator[Tuple[str, str]]]:
+        """
+        Leer un manifiesto
+
+        Returns:
+            (backup_info, iterador de (_id, hash))
+        """
+        info, lines = cls._read_manifest_lines(manifest_path)
+        return info, ((entry[0], entry[1]) for entry in lines)
+
+    def iter_snapshot(self, manifest_path: str) -> Iterator[Dict[str, Any]]:
+        """Reconstruir los documentos de un snapshot, con sus campos volátiles"""
+        _, lines = self._read_manifest_lines(manifest_path)
+        for entry in lines:
+            doc = self.get_document(entry[1])
+            if len(entry) > 2:
+                doc.update(entry[2])
+            yield doc
+
+    def apply_retention(self, keep_last: Optional[int] = None, keep_days: Optional[int] = None,
+                        collection_name: Optional[str] = None) -> List[str]:
+        """
+        Eliminar manifiestos fuera de la política de retención
+
+        Un snapshot se conserva si está entre los keep_last más recientes de su
+        colección o si tiene menos de keep_days días. Sin ninguna política no
+        se elimina nada. Después conviene llamar a gc().
+
+        Returns:
+            Manifiestos eliminados
+        """
+        if keep_last is None and keep_days is None:
+            return []
+
+        por_coleccion: Dict[str, List[Path]] = {}
+        for path in self.list_snapshots(collection_name):
+            por_coleccion.setdefault(_MANIFEST_RE.match(path.name).group('collection'), []).append(path)
+
+        limite = datetime.now() - timedelta(days=keep_days) if keep_days is not None else None
+        removed = []
+        for manifests in por_coleccion.values():
+            for i, path in enumerate(reversed(manifests)):
+                recent_enough = keep_last is not None and i < keep_last
+                young_enough = limite is not None and datetime.fromtimestamp(path.stat().st_mtime) >= limite
+                if recent_enough or young_enough:
+                    continue
+                path.unlink()
+                removed.append(str(path))
+
+        if removed:
+            logger.info(f"🗑️ Retention removed {len(removed)} snapshots")
+        return removed
+
+    def gc(self) -> Dict[str, int]:
+        """
+        Eliminar blobs que ningún manifiesto referencia
+
+        No debe correr en paralelo con snapshot(): los blobs de un snapshot en
+        curso aún no están en ningún manifiesto.
+        """
+        referenced = set()
+        for manifest in self.list_snapshots():
+            _, entries = self.read_manifest(str(manifest))
+            referenced.update(doc_hash for _, doc_hash in entries)
+
+        removed = 0
+        freed = 0
+        for blob in self.blobs_dir.glob('*/*.json.gz'):
+            if blob.name[:-len('.json.gz')] not in referenced:
+                freed += blob.stat().st_size
+                blob.unlink()
+                removed += 1
+
+        logger.info(f"🧹 GC removed {removed} blobs ({freed / 1024:.1f} KB), {len(referenced)} referenced")
+        return {"removed": removed, "freed_bytes": freed, "referenced": len(referenced)}
@@ -0,0 +1,71 @@
+"""
+Benchmark: dicts sueltos vs ProductRecord
+
+Mide memoria por producto (tracemalloc) y tiempo de construcción de
+documentos con MongoDBManager.build_product_doc para ambos caminos.
+
+Uso:
+    python benchmarks/bench_product_record.py [--file products.json] [--copies 200]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from product_record import ProductRecord
+
+
+def load_raw(file_path: str) -> str:
+    """Texto JSON del archivo; cada medición lo decodifica de nuevo para tener objetos propios"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def measure(build, label: str, n: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    items = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<14} {current / n:>8.0f} B/product   build {elapsed * 1e6 / n:>6.2f} us/product")
+    return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ProductRecord vs dict benchmark')
+    parser.add_argument('--file', default='products.json')
+    parser.add_argument('--copies', type=int, default=200)
+    args = parser.parse_args()
+
+    raw = load_raw(args.file)
+    per_copy = len(json.loads(raw))
+    n = per_copy * args.copies
+    print(f"📊 {n} products ({per_copy} x {args.copies}) from {args.file}")
+
+    dicts = measure(lambda: [p for _ in range(args.copies) for p in json.loads(raw)], "dict", n)
+    del dicts
+    # El registro se construye desde el dict y el dict se libera enseguida
+    records = measure(lambda: [ProductRecord(p) for _ in range(args.copies) for p in json.loads(raw)],
+                      "ProductRecord", n)
+
+    try:
+        from product_uploader import MongoDBManager
+    except ImportError as e:
+        print(f"⚠️ Skipping build_product_doc timing: {e}")
+        return
+    dicts = [p for _ in range(args.copies) for p in json.loads(raw)]
+    for label, items in (("dict", dicts), ("ProductRecord", records)):
+        start = time.perf_counter()
+        for item in items:
+            MongoDBManager.build_product_doc(item)
+        print(f"{label:<14} build_product_doc {(time.perf_counter() - start) * 1e6 / n:>6.2f} us/product")
+
+
+if __name__ == '__main__':
+    main()
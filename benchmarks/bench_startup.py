@@ -0,0 +1,86 @@
+"""
+Benchmark: tiempo de arranque de los entry points
+
+Cada caso corre en un intérprete nuevo, como lo hacen docker-entrypoint.sh,
+el HEALTHCHECK de Docker y las acciones de manage.yml. Se reporta la mediana
+de varias corridas.
+
+Uso:
+    python benchmarks/bench_startup.py [--runs 10] [--json results.json]
+        [--max-healthcheck-ms 150]
+
+Con --json se agrega una línea por corrida al archivo (para seguir la
+evolución). Con --max-healthcheck-ms el script sale con código 1 si el probe
+de salud supera ese tiempo.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ("python (baseline)", ["-c", "pass"]),
+    ("healthcheck probe", ["healthcheck.py"]),
+    ("import product_uploader", ["-c", "import product_uploader"]),
+    ("import mongo_backup", ["-c", "import mongo_backup"]),
+    ("import scraper_orchestrator", ["-c", "import scraper_orchestrator"]),
+]
+
+
+def time_case(args, runs: int, env) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable] + args, cwd=BASE_DIR, env=env,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        elapsed = (time.perf_counter() - start) * 1000
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode(errors='replace').strip().splitlines()[-1])
+        samples.append(elapsed)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Entry point startup benchmark')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--json', type=str, default=None, help='Append results to this JSONL file')
+    parser.add_argument('--max-healthcheck-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Estado fresco para que el probe mida el camino normal
+        env = dict(os.environ, ARRYN_STATUS_FILE=os.path.join(tmp, 'status.json'))
+        subprocess.run([sys.executable, 'healthcheck.py', '--write-status'], cwd=BASE_DIR, env=env,
+                       stdout=subprocess.DEVNULL, check=True)
+
+        results = {}
+        print(f"📊 Startup time, median of {args.runs} runs")
+        for label, case_args in CASES:
+            try:
+                results[label] = round(time_case(case_args, args.runs, env), 1)
+                print(f"   {label:<28} {results[label]:>8.1f} ms")
+            except RuntimeError as e:
+                print(f"   {label:<28} {'skipped':>8}  ({e})")
+
+    if args.json:
+        with open(args.json, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"timestamp": datetime.now().isoformat(),
+                                "python": sys.version.split()[0], "results_ms": results}) + '\n')
+
+    probe = results.get("healthcheck probe")
+    if args.max_healthcheck_ms is not None and (probe is None or probe > args.max_healthcheck_ms):
+        print(f"❌ healthcheck probe {probe} ms exceeds {args.max_healthcheck_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+"""
+Pool de navegadores headless reutilizables para scrapers con Playwright/Selenium
+
+El orchestrator arranca uno o más Chromium headless con
+--remote-debugging-port y publica sus endpoints CDP en ARRYN_BROWSER_ENDPOINTS.
+Los scrapers se conectan a un navegador ya caliente en lugar de lanzar uno
+propio:
+
+    from browser_pool import connect_playwright, page_slot
+    with sync_playwright() as p:
+        browser = connect_playwright(p)
+        with page_slot():
+            page = browser.new_context().new_page()
+            ...
+
+Para Selenium, apply_selenium_options(options) fija debugger_address.
+Sin pool configurado, ambos helpers caen al lanzamiento normal.
+
+El número de páginas simultáneas se limita entre procesos con archivos de
+bloqueo (ARRYN_BROWSER_SLOTS_DIR), y el orchestrator recicla los navegadores
+cuya memoria supera el límite configurado.
+"""
+
+import contextlib
+import fcntl
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+BROWSER_ENDPOINTS_ENV_VAR = 'ARRYN_BROWSER_ENDPOINTS'
+BROWSER_SLOTS_DIR_ENV_VAR = 'ARRYN_BROWSER_SLOTS_DIR'
+BROWSER_MAX_PAGES_ENV_VAR = 'ARRYN_BROWSER_MAX_PAGES'
+
+DEFAULT_MAX_PAGES = 4
+DEFAULT_MAX_RSS_MB = 1024
+STARTUP_TIMEOUT = 20
+
+CHROME_FLAGS = [
+    '--headless=new',
+    '--no-sandbox',
+    '--disable-gpu',
+    '--disable-dev-shm-usage',
+    '--disable-extensions',
+    '--no-first-run',
+    '--remote-debugging-address=127.0.0.1',
+]
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _process_tree_rss_mb(root_pid: int) -> float:
+    """Memoria residente (MB) de un proceso y todos sus descendientes según /proc"""
+    children: Dict[int, List[int]] = {}
+    for stat_path in Path('/proc').glob('[0-9]*/stat'):
+        try:
+            # El nombre del proceso va entre paréntesis y puede contener espacios
+            fields = stat_path.read_text().rsplit(')', 1)[1].split()
+            pid, ppid = int(stat_path.parent.name), int(fields[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(pid)
+
+    total_kb = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        pending.extend(children.get(pid, []))
+        try:
+            for line in Path(f'/proc/{pid}/status').read_text().splitlines():
+                if line.startswith('VmRSS:'):
+                    total_kb += int(line.split()[1])
+                    break
+        except (OSError, ValueError):
+            continue
+    return total_kb / 1024
+
+
+class PooledBrowser:
+    """Un Chromium headless con endpoint CDP"""
+
+    def __init__(self, chrome_bin: str):
+        self.chrome_bin = chrome_bin
+        self.port = None
+        self.process = None
+        self.profile_dir = None
+        self.started_at = None
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.port = _free_port()
+        self.profile_dir = tempfile.mkdtemp(prefix='arryn_browser_')
+        cmd = [self.chrome_bin, *CHROME_FLAGS,
+               f'--remote-debugging-port={self.port}',
+               f'--user-data-dir={self.profile_dir}',
+               'about:blank']
+        try:
+            self.process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.started_at = time.time()
+
+            # Esperar a que el endpoint CDP responda
+            deadline = time.time() + STARTUP_TIMEOUT
+            while time.time() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"Browser exited during startup (code {self.process.returncode})")
+                try:
+                    import urllib.request  # solo al arrancar un navegador
+                    with urllib.request.urlopen(f"{self.endpoint}/json/version", timeout=1):
+                        return
+                except OSError:
+                    time.sleep(0.2)
+            raise RuntimeError(f"Browser did not expose CDP endpoint on port {self.port}")
+        except BaseException:
+            # No dejar procesos ni perfiles temporales de un arranque fallido
+            self.stop()
+            raise
+
+    def rss_mb(self) -> float:
+        if self.process is None or self.process.poll() is not None:
+            return 0.0
+        return _process_tree_rss_mb(self.process.pid)
+
+    def stop(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+
+class BrowserPool:
+    """
+    Pool de navegadores calientes administrado por el orchestrator
+    """
+
+    def __init__(self, size: int = 1, max_pages: int = DEFAULT_MAX_PAGES,
+                 max_rss_mb: float = DEFAULT_MAX_RSS_MB, slots_dir: Optional[str] = None,
+                 chrome_bin: Optional[str] = None):
+        self.size = max(1, size)
+        self.max_pages = max(1, max_pages)
+        self.max_rss_mb = max_rss_mb
+        self.slots_dir = Path(slots_dir or tempfile.mkdtemp(prefix='arryn_browser_slots_'))
+        self.chrome_bin = chrome_bin or os.getenv('CHROME_BIN') or shutil.which('chromium') \
+            or shutil.which('chromium-browser') or shutil.which('google-chrome') or 'chromium'
+        self.browsers: List[PooledBrowser] = []
+
+    def start(self):
+        self.slots_dir.mkdir(parents=True, exist_ok=True)
+        for _ in range(self.size):
+            browser = PooledBrowser(self.chrome_bin)
+            browser.start()
+            self.browsers.append(browser)
+        logger.info(f"🌐 Browser pool started: {self.size} browsers, {self.max_pages} page slots")
+
+    def env(self) -> Dict[str, str]:
+        """Variables de entorno para que los scrapers se conecten al pool"""
+        return {
+            BROWSER_ENDPOINTS_ENV_VAR: ','.join(b.endpoint for b in self.browsers),
+            BROWSER_SLOTS_DIR_ENV_VAR: str(self.slots_dir),
+            BROWSER_MAX_PAGES_ENV_VAR: str(self.max_pages),
+        }
+
+    def recycle(self) -> int:
+        """
+        Reiniciar navegadores caídos o que superan max_rss_mb
+
+        Debe llamarse entre ejecuciones de scrapers, cuando no hay páginas abiertas.
+
+        Returns:
+            Número de navegadores reiniciados
+        """
+        recycled = 0
+        for browser in self.browsers:
+            rss = browser.rss_mb()
+            alive = browser.process is not None and browser.process.poll() is None
+            if alive and rss <= self.max_rss_mb:
+                continue
+            logger.info(f"♻️ Recycling browser on port {browser.port} (alive={alive}, rss={rss:.0f} MB)")
+            browser.stop()
+            browser.start()
+            recycled += 1
+        return recycled
+
+    def stop(self):
+        for browser in self.browsers:
+            browser.stop()
+        self.browsers = []
+        shutil.rmtree(self.slots_dir, ignore_errors=True)
+        logger.info("🔌 Browser pool stopped")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# --- Helpers para los scrapers ---
+
+def pool_endpoint() -> Optional[str]:
+    """Endpoint CDP asignado a este proceso, o None si no hay pool"""
+    endpoints = [e for e in os.getenv(BROWSER_ENDPOINTS_ENV_VAR, '').split(',') if e]
+    if not endpoints:
+        return None
+    return endpoints[os.getpid() % len(endpoints)]
+
+
+@contextlib.contextmanager
+def page_slot(poll_interval: float = 0.2) -> Iterator[None]:
+    """
+    Reservar uno de los ARRYN_BROWSER_MAX_PAGES slots de página del pool
+
+    Sin pool configurado no limita nada.
+    """
+    slots_dir = os.getenv(BROWSER_SLOTS_DIR_ENV_VAR)
+    if not slots_dir:
+        yield
+        return
+
+    max_pages = int(os.getenv(BROWSER_MAX_PAGES_ENV_VAR, DEFAULT_MAX_PAGES))
+    while True:
+        for i in range(max_pages):
+            f = open(os.path.join(slots_dir, f'slot_{i}.lock'), 'a')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                continue
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
+            return
+        time.sleep(poll_interval)
+
+
+def connect_playwright(playwright, **launch_kwargs):
+    """Conectarse al navegador del pool o lanzar uno propio si no hay pool"""
+    endpoint = pool_endpoint()
+    if endpoint:
+        return playwright.chromium.connect_over_cdp(endpoint)
+    launch_kwargs.setdefault('headless', True)
+    return playwright.chromium.launch(**launch_kwargs)
+
+
+def apply_selenium_options(options):
+    """Configurar ChromeOptions de Selenium para adjuntarse al navegador del pool"""
+    endpoint = pool_endpoint()
+    if endpoint:
+        options.debugger_address = endpoint.replace('http://', '')
+    return options
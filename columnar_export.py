@@ -0,0 +1,452 @@
+"""
+Exportación columnar de productos para análisis
+
+Convierte la colección (o un backup) a archivos columnares comprimidos para
+que los análisis no escaneen el cluster de producción ni parseen los backups
+JSON con indentación:
+
+  - Parquet (zstd) si pyarrow está instalado
+  - Si no, un formato columnar propio (.acol): grupos de filas con arreglos
+    tipados y cadenas codificadas por diccionario, comprimidos con zlib
+
+La salida se particiona al estilo Hive, por ejemplo:
+    <salida>/fuente=alkosto.com/fecha=2025-09-04/part-00000.parquet
+
+La columna 'fuente' no se repite dentro de los archivos cuando se particiona
+por ella (los lectores Hive la reconstruyen desde la ruta). Con 'fields' solo
+se leen y escriben las columnas pedidas; en la colección en vivo la proyección
+se envía a MongoDB.
+
+Formato .acol:
+    b'ACOL1\\n'
+    por cada grupo de filas:
+        uint32 LE con el largo del encabezado, encabezado JSON
+        {"rows": n, "columns": [{"name", "type", "encoding", "size"}, ...]}
+        un bloque zlib por columna, en el orden del encabezado
+"""
+
+import json
+import os
+import shutil
+import struct
+import sys
+import zlib
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tipos de las columnas conocidas (ver ProductUploader.build_product_doc)
+PRODUCT_SCHEMA: Dict[str, str] = {
+    "_id": "string",
+    "product_id": "string",
+    "product_hash": "string",
+    "contador_extraccion_total": "int",
+    "contador_extraccion": "int",
+    "titulo": "string",
+    "marca": "string",
+    "categoria": "string",
+    "precio_texto": "string",
+    "precio_valor": "float",  # hay precios con decimales (12.5)
+    "moneda": "string",
+    "tamaño": "string",
+    "calificacion": "float",
+    "detalles_adicionales": "string",
+    "fuente": "string",
+    "imagen": "string",
+    "link": "string",
+    "pagina": "int",
+    "fecha_extraccion": "string",
+    "extraction_status": "string",
+    "created_at": "string",
+    "updated_at": "string",
+}
+
+PARTITION_KEYS = ('fuente', 'fecha')
+DEFAULT_ROW_GROUP_SIZE = 50000
+MAX_OPEN_WRITERS = 64
+MAX_BUFFERED_ROWS = 200000
+
+ACOL_MAGIC = b'ACOL1\n'
+_PYARROW_MISSING = object()
+_pyarrow = None
+_ARRAY_CODES = {"int": 'q', "float": 'd'}
+
+
+def _load_pyarrow():
+    """Importar pyarrow solo al exportar (tarda más que el resto del CLI)"""
+    global _pyarrow
+    if _pyarrow is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+            _pyarrow = (pyarrow, pyarrow.parquet)
+        except ImportError:
+            _pyarrow = _PYARROW_MISSING
+    return None if _pyarrow is _PYARROW_MISSING else _pyarrow
+
+
+def _coerce(value: Any, col_type: str) -> Any:
+    """Convertir un valor al tipo de su columna; None si no es convertible"""
+    if value is None or value == '':
+        return None
+    if col_type == "string":
+        return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    if isinstance(value, bool):
+        value = int(value)
+    if col_type == "int" and isinstance(value, int):
+        return value
+    try:
+        if col_type == "int":
+            number = float(value)
+            return int(number) if number.is_integer() else None
+        return float(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def partition_values(doc: Dict[str, Any], partition_by: Sequence[str]) -> Tuple[str, ...]:
+    """Valores de partición de un documento ('fecha' es el día de fecha_extraccion)"""
+    values = []
+    for key in partition_by:
+        if key == 'fecha':
+            value = str(doc.get('fecha_extraccion') or '')[:10]
+        else:
+            value = str(doc.get(key) or '')
+        # Evitar separadores de ruta en nombres de directorio
+        values.append(value.replace('/', '_').replace(os.sep, '_') or 'unknown')
+    return tuple(values)
+
+
+def source_fields(fields: Optional[Sequence[str]], partition_by: Sequence[str]) -> Optional[List[str]]:
+    """Campos que hay que leer de la fuente: los pedidos más los de partición"""
+    if fields is None:
+        return None
+    needed = list(fields)
+    for key in partition_by:
+        source = 'fecha_extraccion' if key == 'fecha' else key
+        if source not in needed:
+            needed.append(source)
+    return needed
+
+
+# ---------------------------------------------------------------------------
+# Escritores por partición
+
+
+class _ParquetPartWriter:
+    """Archivo Parquet de una partición"""
+
+    extension = '.parquet'
+    _TYPES = {"string": "string", "int": "int64", "float": "float64"}
+
+    def __init__(self, path: Path, columns: List[Tuple[str, str]]):
+        self.pa, pq = _load_pyarrow()
+        self.schema = self.pa.schema([(name, getattr(self.pa, self._TYPES[col_type])()) for name, col_type in columns])
+        self.writer = pq.ParquetWriter(str(path), self.schema, compression='zstd')
+
+    def write(self, data: Dict[str, List[Any]], rows: int):
+        self.writer.write_table(self.pa.Table.from_pydict(data, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class _ColumnarPartWriter:
+    """Archivo .acol de una partición"""
+
+    extension = '.acol'
+
+    def __init__(self, path: Path, columns: List[Tuple[str, str]]):
+        self.columns = columns
+        self.f = open(path, 'wb')
+        self.f.write(ACOL_MAGIC)
+
+    @staticmethod
+    def _encode_column(values: List[Any], col_type: str) -> Tuple[str, bytes]:
+        if col_type in _ARRAY_CODES:
+            nulls = bytearray((len(values) + 7) // 8)
+            for i, value in enumerate(values):
+                if value is None:
+                    nulls[i >> 3] |= 1 << (i & 7)
+            data = array(_ARRAY_CODES[col_type], (0 if v is None else v for v in values))
+            if sys.byteorder == 'big':
+                data.byteswap()
+            return "plain", bytes(nulls) + data.tobytes()
+
+        distinct: Dict[str, int] = {}
+        for value in values:
+            if value is not None and value not in distinct:
+                distinct[value] = len(distinct)
+        if len(distinct) * 2 <= len(values):
+            # Diccionario + índices (-1 = nulo): fuente, marca, moneda, categoría...
+            indices = array('i', (-1 if v is None else distinct[v] for v in values))
+            if sys.byteorder == 'big':
+                indices.byteswap()
+            dictionary = json.dumps(list(distinct), ensure_ascii=False).encode('utf-8')
+            return "dict", struct.pack('<I', len(dictionary)) + dictionary + indices.tobytes()
+
+        encoded = [None if v is None else v.encode('utf-8') for v in values]
+        lengths = array('i', (-1 if v is None else len(v) for v in encoded))
+        if sys.byteorder == 'big':
+            lengths.byteswap()
+        return "plain", lengths.tobytes() + b''.join(v for v in encoded if v is not None)
+
+    def write(self, data: Dict[str, List[Any]], rows: int):
+        header_columns = []
+        blobs = []
+        for name, col_type in self.columns:
+            encoding, raw = self._encode_column(data[name], col_type)
+            blob = zlib.compress(raw, 6)
+            header_columns.append({"name": name, "type": col_type, "encoding": encoding, "size": len(blob)})
+            blobs.append(blob)
+        header = json.dumps({"rows": rows, "columns": header_columns}, ensure_ascii=False).encode('utf-8')
+        self.f.write(struct.pack('<I', len(header)) + header)
+        for blob in blobs:
+            self.f.write(blob)
+
+    def close(self):
+        self.f.close()
+
+
+def _decode_column(raw: bytes, col_type: str, encoding: str, rows: int) -> List[Any]:
+    if col_type in _ARRAY_CODES:
+        null_bytes = (rows + 7) // 8
+        nulls = raw[:null_bytes]
+        data = array(_ARRAY_CODES[col_type])
+        data.frombytes(raw[null_bytes:])
+        if sys.byteorder == 'big':
+            data.byteswap()
+        return [None if nulls[i >> 3] & (1 << (i & 7)) else data[i] for i in range(rows)]
+
+    if encoding == "dict":
+        (dict_len,) = struct.unpack_from('<I', raw)
+        dictionary = json.loads(raw[4:4 + dict_len].decode('utf-8'))
+        indices = array('i')
+        indices.frombytes(raw[4 + dict_len:])
+        if sys.byteorder == 'big':
+            indices.byteswap()
+        return [None if i < 0 else dictionary[i] for i in indices]
+
+    lengths = array('i')
+    lengths.frombytes(raw[:rows * lengths.itemsize])
+    if sys.byteorder == 'big':
+        lengths.byteswap()
+    values = []
+    pos = rows * lengths.itemsize
+    for length in lengths:
+        if length < 0:
+            values.append(None)
+        else:
+            values.append(raw[pos:pos + length].decode('utf-8'))
+            pos += length
+    return values
+
+
+def iter_columnar_groups(path: str, columns: Optional[Sequence[str]] = None) -> Iterator[Dict[str, List[Any]]]:
+    """
+    Leer un archivo .acol por grupos de filas
+
+    Las columnas no pedidas se saltan sin descomprimirse.
+
+    Yields:
+        Dict columna → lista de valores
+    """
+    wanted = set(columns) if columns is not None else None
+    with open(path, 'rb') as f:
+        if f.read(len(ACOL_MAGIC)) != ACOL_MAGIC:
+            raise ValueError(f"❌ {path} is not an .acol file")
+        while True:
+            size = f.read(4)
+            if not size:
+                return
+            header = json.loads(f.read(struct.unpack('<I', size)[0]))
+            group = {}
+            for column in header["columns"]:
+                if wanted is not None and column["name"] not in wanted:
+                    f.seek(column["size"], os.SEEK_CUR)
+                    continue
+                raw = zlib.decompress(f.read(column["size"]))
+                group[column["name"]] = _decode_column(raw, column["type"], column["encoding"], header["rows"])
+            yield group
+
+
+def iter_export_rows(export_dir: str, columns: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Recorrer fila por fila una exportación .acol, con las columnas de partición
+    reconstruidas desde la ruta (para Parquet usar pyarrow.dataset o DuckDB)
+    """
+    for path in sorted(Path(export_dir).rglob('*.acol')):
+        partition = dict(
+            part.split('=', 1) for part in path.relative_to(export_dir).parts[:-1] if '=' in part
+        )
+        for group in iter_columnar_groups(str(path), columns):
+            names = list(group)
+            rows = len(group[names[0]]) if names else 0
+            for i in range(rows):
+                row = {name: group[name][i] for name in names}
+                for key, value in partition.items():
+                    if columns is None or key in columns:
+                        row.setdefault(key, value)
+                yield row
+
+
+# ---------------------------------------------------------------------------
+# Exportación
+
+
+class _Partition:
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.buffer: List[Dict[str, Any]] = []
+        self.writer = None
+        self.parts = 0
+
+
+def resolve_format(fmt: str = 'auto') -> str:
+    if fmt == 'auto':
+        return 'parquet' if _load_pyarrow() is not None else 'acol'
+    if fmt == 'parquet' and _load_pyarrow() is None:
+        raise ValueError("❌ Parquet export requires pyarrow (pip install pyarrow) or --format acol")
+    if fmt not in ('parquet', 'acol'):
+        raise ValueError(f"❌ Unknown export format: {fmt}")
+    return fmt
+
+
+def export_products(documents: Iterable[Dict[str, Any]], output_dir: str,
+                    fields: Optional[Sequence[str]] = None,
+                    partition_by: Sequence[str] = PARTITION_KEYS,
+                    fmt: str = 'auto',
+                    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                    source: str = '') -> Dict[str, Any]:
+    """
+    Exportar documentos a archivos columnares particionados
+
+    La exportación se construye en '<output_dir>.tmp' y reemplaza a output_dir
+    solo al terminar, así un lector nunca ve una exportación a medias.
+
+    Args:
+        documents: Documentos ya convertidos a JSON (ver convert_doc_for_json)
+        output_dir: Directorio destino
+        fields: Columnas a exportar (None = esquema de productos completo)
+        partition_by: Subconjunto de ('fuente', 'fecha')
+        fmt: 'auto', 'parquet' o 'acol'
+        row_group_size: Filas por grupo (memoria por partición)
+        source: Descripción de la fuente para el manifiesto
+
+    Returns:
+        Resumen con filas, archivos, particiones, bytes escritos y valores no
+        convertibles por columna (exportados como null)
+    """
+    fmt = resolve_format(fmt)
+    for key in partition_by:
+        if key not in PARTITION_KEYS:
+            raise ValueError(f"❌ Unknown partition key: {key} (use {', '.join(PARTITION_KEYS)})")
+
+    names = list(fields) if fields else list(PRODUCT_SCHEMA)
+    # La columna de partición se reconstruye desde la ruta
+    columns = [(name, PRODUCT_SCHEMA.get(name, "string")) for name in names if name not in partition_by]
+    writer_cls = _ParquetPartWriter if fmt == 'parquet' else _ColumnarPartWriter
+
+    final_dir = Path(output_dir)
+    tmp_dir = final_dir.with_name(final_dir.name + '.tmp')
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    partitions: Dict[Tuple[str, ...], _Partition] = {}
+    open_writers: 'OrderedDict[Tuple[str, ...], _Partition]' = OrderedDict()
+    stats = {"rows": 0, "files": 0, "buffered": 0}
+    # Valores presentes que no se pudieron convertir al tipo de su columna
+    coercion_failures: Dict[str, int] = {}
+
+    def flush(key: Tuple[str, ...], partition: _Partition):
+        if not partition.buffer:
+            return
+        if partition.writer is None:
+            if len(open_writers) >= MAX_OPEN_WRITERS:
+                # Cerrar el escritor menos usado; si la partición vuelve, abre otro part-N
+                _, oldest = open_writers.popitem(last=False)
+                oldest.writer.close()
+                oldest.writer = None
+            partition.directory.mkdir(parents=True, exist_ok=True)
+            path = partition.directory / f"part-{partition.parts:05d}{writer_cls.extension}"
+            partition.writer = writer_cls(path, columns)
+            partition.parts += 1
+            stats["files"] += 1
+        open_writers[key] = partition
+        open_writers.move_to_end(key)
+
+        rows = partition.buffer
+        data = {}
+        for name, col_type in columns:
+            values = [_coerce(row.get(name), col_type) for row in rows]
+            failed = sum(1 for row, value in zip(rows, values)
+                         if value is None and row.get(name) not in (None, ''))
+            if failed:
+                coercion_failures[name] = coercion_failures.get(name, 0) + failed
+            data[name] = values
+        partition.writer.write(data, len(rows))
+        stats["buffered"] -= len(rows)
+        partition.buffer = []
+
+    try:
+        for doc in documents:
+            key = partition_values(doc, partition_by)
+            partition = partitions.get(key)
+            if partition is None:
+                directory = tmp_dir.joinpath(*(f"{k}={v}" for k, v in zip(partition_by, key)))
+                partition = partitions[key] = _Partition(directory)
+            partition.buffer.append(doc)
+            stats["rows"] += 1
+            stats["buffered"] += 1
+
+            if len(partition.buffer) >= row_group_size:
+                flush(key, partition)
+            elif stats["buffered"] >= MAX_BUFFERED_ROWS:
+                # Muchas particiones pequeñas: vaciar la más grande
+                largest = max(partitions, key=lambda k: len(partitions[k].buffer))
+                flush(largest, partitions[largest])
+
+        for key, partition in partitions.items():
+            flush(key, partition)
+    finally:
+        for partition in open_writers.values():
+            partition.writer.close()
+            partition.writer = None
+
+    total_bytes = sum(p.stat().st_size for p in tmp_dir.rglob(f'*{writer_cls.extension}'))
+    summary = {
+        "format": fmt,
+        "source": source,
+        "rows": stats["rows"],
+        "files": stats["files"],
+        "partitions": len(partitions),
+        "partition_by": list(partition_by),
+        "columns": [{"name": name, "type": col_type} for name, col_type in columns],
+        "coercion_failures": coercion_failures,
+        "bytes": total_bytes
+    }
+    with open(tmp_dir / '_export.json', 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    if final_dir.exists():
+        old_dir = final_dir.with_name(final_dir.name + '.old')
+        if old_dir.exists():
+            shutil.rmtree(old_dir)
+        final_dir.rename(old_dir)
+        tmp_dir.rename(final_dir)
+        shutil.rmtree(old_dir)
+    else:
+        tmp_dir.rename(final_dir)
+
+    summary["output_dir"] = str(final_dir)
+    for name, failed in coercion_failures.items():
+        logger.warning(f"⚠️ {failed} values of '{name}' could not be converted to "
+                       f"{PRODUCT_SCHEMA.get(name, 'string')} and were exported as null")
+    logger.info(f"✅ Exported {summary['rows']} rows to {final_dir} "
+                f"({fmt}, {summary['partitions']} partitions, {total_bytes / 1024:.1f} KB)")
+    return summary
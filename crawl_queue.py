@@ -0,0 +1,298 @@
+"""
+Planificador de crawl y cola de trabajo persistente (SQLite)
+
+Expande (retailer × categoría) en unidades de trabajo y
+las guarda en una base SQLite local. Los workers toman unidades con un lease
+con vencimiento; si un proceso muere, sus unidades vuelven a quedar
+pendientes y la siguiente invocación continúa donde quedó.
+
+La asignación es justa por retailer: siempre se elige el retailer con menos
+unidades en curso y, a igualdad, el que lleva más tiempo sin recibir una.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 900
+DEFAULT_MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_units (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    retailer TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    page_start INTEGER NOT NULL,
+    page_end INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    leased_at REAL,
+    last_error TEXT,
+    output_file TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (retailer, categoria, page_start, page_end)
+);
+CREATE INDEX IF NOT EXISTS idx_work_units_status ON work_units (status, retailer, id);
+"""
+
+
+def default_worker_id() -> str:
+    """Identificador del worker: host:pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def expand_plan(retailers: List[str], categorias: List[str], paginas: int) -> List[Dict[str, Any]]:
+    """
+    Expandir el plan en unidades de trabajo
+
+    Cada unidad cubre las páginas 1..paginas de un (retailer, categoría): los
+    scrapers actuales no aceptan una página inicial, así que una categoría no
+    se puede repartir entre varios workers.
+
+    Args:
+        retailers: Scrapers a ejecutar
+        categorias: Categorías a recorrer en cada retailer
+        paginas: Páginas totales por (retailer, categoría)
+    """
+    return [
+        {"retailer": retailer, "categoria": categoria, "page_start": 1, "page_end": paginas}
+        for retailer in retailers
+        for categoria in categorias
+    ]
+
+
+class CrawlQueue:
+    """
+    Cola durable de unidades de crawl con leases
+    """
+
+    def __init__(self, db_path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # isolation_level=None: las transacciones se controlan explícitamente
+        self.conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+
+        # Migración: colas creadas antes de registrar resultados
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(work_units)")}
+        if 'result' not in columns:
+            self.conn.execute("ALTER TABLE work_units ADD COLUMN result TEXT")
+
+    def add_units(self, units: List[Dict[str, Any]]) -> int:
+        """
+        Registrar unidades; las ya existentes se conservan con su estado
+
+        Returns:
+            Número de unidades nuevas
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO work_units "
+                "(retailer, categoria, page_start, page_end, max_attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(u["retailer"], u["categoria"], u["page_start"], u["page_end"],
+                  self.max_attempts, now, now) for u in units]
+            )
+            added = self.conn.total_changes - before
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def _expire_leases(self, now: float):
+        """Devolver a pendientes (o fallidas) las unidades con lease vencido"""
+        self.conn.execute(
+            "UPDATE work_units SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END, "
+            "lease_owner = NULL, lease_expires = NULL, last_error = 'lease expired', updated_at = ? "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (now, now)
+        )
+
+    def release_dead_leases(self) -> int:
+        """
+        Liberar leases de procesos muertos en este mismo host
+
+        Permite reanudar inmediatamente tras un crash sin esperar el vencimiento.
+        """
+        host = socket.gethostname()
+        rows = self.conn.execute(
+            "SELECT DISTINCT lease_owner FROM work_units WHERE status = 'leased' AND lease_owner LIKE ?",
+            (f"{host}:%",)
+        ).fetchall()
+
+        released = 0
+        for row in rows:
+            owner = row["lease_owner"]
+            try:
+                pid = int(owner.rsplit(':', 1)[1])
+                os.kill(pid, 0)
+                continue  # Proceso vivo
+            except ProcessLookupError:
+                pass
+            except (ValueError, PermissionError):
+                continue
+            cur = self.conn.execute(
+                "UPDATE work_units SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END, "
+                "lease_owner = NULL, lease_expires = NULL, last_error = 'worker died', updated_at = ? "
+                "WHERE status = 'leased' AND lease_owner = ?",
+                (time.time(), owner)
+            )
+            released += cur.rowcount
+        if released:
+            logger.info(f"♻️ Released {released} leases from dead workers")
+        return released
+
+    def lease(self, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Tomar la siguiente unidad pendiente con reparto justo entre retailers
+
+        Returns:
+            Unidad como dict, o None si no hay trabajo pendiente
+        """
+        owner = owner or default_worker_id()
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._expire_leases(now)
+            row = self.conn.execute(
+                """
+                SELECT p.id FROM (
+                    SELECT retailer, MIN(id) AS id FROM work_units
+                    WHERE status = 'pending' GROUP BY retailer
+                ) p
+                LEFT JOIN (
+                    SELECT retailer,
+                           SUM(status = 'leased') AS in_flight,
+                           MAX(COALESCE(leased_at, 0)) AS last_leased
+                    FROM work_units GROUP BY retailer
+                ) r ON r.retailer = p.retailer
+                ORDER BY COALESCE(r.in_flight, 0), COALESCE(r.last_leased, 0), p.id
+                LIMIT 1
+                """
+            ).fetchone()
+
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+
+            self.conn.execute(
+                "UPDATE work_units SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires = ?, leased_at = ?, updated_at = ? WHERE id = ?",
+                (owner, now + self.lease_seconds, now, now, row["id"])
+            )
+            unit = self.conn.execute("SELECT * FROM work_units WHERE id = ?", (row["id"],)).fetchone()
+            self.conn.execute("COMMIT")
+            return dict(unit)
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def heartbeat(self, unit_id: int, owner: str) -> bool:
+        """
+        Extender el lease de una unidad en curso
+
+        Usa su propia conexión para poder llamarse desde el hilo de LeaseHeartbeat.
+
+        Returns:
+            False si el lease ya no pertenece a owner
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                cur = conn.execute(
+                    "UPDATE work_units SET lease_expires = ?, updated_at = ? "
+                    "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                    (time.time() + self.lease_seconds, time.time(), unit_id, owner)
+                )
+            return cur.rowcount == 1
+        finally:
+            conn.close()
+
+    def complete(self, unit_id: int, output_file: Optional[str] = None,
+                 result: Optional[Dict[str, Any]] = None, owner: Optional[str] = None):
+        """Marcar una unidad como terminada (solo si owner conserva el lease)"""
+        self.conn.execute(
+            "UPDATE work_units SET status = 'done', output_file = ?, result = ?, lease_owner = NULL, "
+            "lease_expires = NULL, last_error = NULL, updated_at = ? "
+            "WHERE id = ? AND (? IS NULL OR lease_owner = ?)",
+            (output_file, json.dumps(result, ensure_ascii=False) if result is not None else None,
+             time.time(), unit_id, owner, owner)
+        )
+
+    def fail(self, unit_id: int, error: str, owner: Optional[str] = None):
+        """Registrar un fallo; la unidad se reintenta hasta max_attempts"""
+        self.conn.execute(
+            "UPDATE work_units SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END, "
+            "last_error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND (? IS NULL OR lease_owner = ?)",
+            (error[:1000], time.time(), unit_id, owner, owner)
+        )
+
+    def reset(self) -> int:
+        """Eliminar las unidades terminadas o fallidas para empezar un crawl nuevo"""
+        cur = self.conn.execute("DELETE FROM work_units WHERE status IN ('done', 'failed')")
+        return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        """Conteo de unidades por estado"""
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM work_units GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def close(self):
+        self.conn.close()
+
+
+class LeaseHeartbeat:
+    """
+    Hilo que renueva periódicamente el lease de una unidad mientras se procesa
+
+        with LeaseHeartbeat(queue, unit_id, owner, interval=30):
+            ejecutar(...)
+    """
+
+    def __init__(self, queue, unit_id: Any, owner: str, interval: float):
+        self.queue = queue
+        self.unit_id = unit_id
+        self.owner = owner
+        self.interval = interval
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.queue.heartbeat(self.unit_id, self.owner):
+                    self.lost = True
+                    logger.warning(f"⚠️ Lease lost for unit {self.unit_id}")
+                    return
+            except Exception as e:
+                logger.warning(f"⚠️ Heartbeat failed for unit {self.unit_id}: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
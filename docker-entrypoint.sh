@@ -16,17 +16,9 @@ trap cleanup SIGTERM SIGINT
 mkdir -p /app/logs
 echo "$(date): Container iniciado" >> /app/logs/container.log
 
-# Verificar conexión a MongoDB
-python -c "
-try:
-    from product_uploader import ProductUploader
-    uploader = ProductUploader()
-    uploader.close()
-    print('✅ MongoDB connection OK')
-except Exception as e:
-    print(f'❌ MongoDB connection failed: {e}')
-    # No salir con error, solo logear
-" >> /app/logs/container.log 2>&1
+# Verificar conexión a MongoDB con un ping corto y dejar el estado inicial
+# para el HEALTHCHECK (no abre un ProductUploader completo)
+python healthcheck.py --write-status --ping >> /app/logs/container.log 2>&1 || true
 
 echo "✅ Container ready y monitoreando..."
 echo "$(date): Container ready" >> /app/logs/container.log
@@ -36,28 +28,14 @@ while true; do
     # Log heartbeat cada 5 minutos
     echo "$(date): Container running - Heartbeat" >> /app/logs/container.log
     
-    # Verificar salud del sistema cada 5 minutos
-    python -c "
-import os
-import json
-from datetime import datetime
-
-try:
-    # Crear status file para monitoreo externo
-    status = {
-        'timestamp': datetime.now().isoformat(),
-        'status': 'healthy',
-        'uptime_seconds': float(open('/proc/uptime').read().split()[0]),
-        'container_logs': len([f for f in os.listdir('/app/logs') if f.endswith('.log')]) if os.path.exists('/app/logs') else 0,
-        'scraped_files': len([f for f in os.listdir('/app/scraped_output') if f.endswith('.json')]) if os.path.exists('/app/scraped_output') else 0,
-        'backup_files': len([f for f in os.listdir('/app/backups') if f.endswith('.json')]) if os.path.exists('/app/backups') else 0
-    }
-
-    with open('/app/logs/status.json', 'w') as f:
-        json.dump(status, f, indent=2)
-except Exception as e:
-    print(f'Error creating status: {e}')
-" 2>/dev/null
+    # Verificar salud del sistema cada 5 minutos; el HEALTHCHECK de Docker
+    # solo lee /app/logs/status.json
+    python healthcheck.py --write-status --ping > /dev/null 2>&1 || true
+    
+    # Reproducir productos encolados mientras MongoDB no estaba disponible
+    if ls /app/spool/segment_*.jsonl >/dev/null 2>&1; then
+        python product_uploader.py --drain-spool >> /app/logs/container.log 2>&1 || true
+    fi
     
     # Limpiar logs viejos (mantener solo últimos 7 días)
     find /app/logs -name "*.log" -mtime +7 -delete 2>/dev/null || true
@@ -4,6 +4,7 @@ Ejemplo de uso del ProductUploader
 
 from product_uploader import ProductUploader
 import json
+import logging
 
 def ejemplo_basico():
     """Ejemplo básico de uso"""
@@ -114,6 +115,12 @@ def ejemplo_multiples_productos():
         uploader.close()
 
 if __name__ == "__main__":
+    # product_uploader no configura el logging al importarse
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    
     # Ejecutar ejemplos
     ejemplo_basico()
     print("\n" + "="*50 + "\n")
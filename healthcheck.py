@@ -0,0 +1,176 @@
+"""
+Health check liviano para el container
+
+El proceso residente (docker-entrypoint.sh) escribe cada pocos minutos el
+estado en logs/status.json con --write-status, incluyendo un ping corto a
+MongoDB. El probe de Docker solo lee ese archivo: no importa pymongo, dotenv
+ni product_uploader, así que responde en milisegundos.
+
+Uso:
+    python healthcheck.py                      # probe: lee el estado cacheado
+    python healthcheck.py --ping               # ping directo a MongoDB (timeout corto)
+    python healthcheck.py --write-status --ping
+
+Estados:
+    healthy   todo en orden
+    degraded  MongoDB no responde; las cargas van al spool (exit 0 salvo --strict)
+    unhealthy estado ausente, viejo o marcado como tal (exit 1)
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATUS_FILE = os.getenv('ARRYN_STATUS_FILE', os.path.join(BASE_DIR, 'logs', 'status.json'))
+# El entrypoint escribe cada 5 minutos; tolerar dos escrituras perdidas
+DEFAULT_MAX_AGE = 900
+DEFAULT_PING_TIMEOUT_MS = 2000
+
+
+def ping_mongodb(timeout_ms: int = DEFAULT_PING_TIMEOUT_MS) -> dict:
+    """Ping a MongoDB con timeouts cortos; pymongo se importa solo aquí"""
+    connection_string = os.getenv('MONGODB_CONNECTION_STRING')
+    if not connection_string:
+        try:
+            from dotenv import load_dotenv
+            load_dotenv(os.path.join(BASE_DIR, '.env'))
+            connection_string = os.getenv('MONGODB_CONNECTION_STRING')
+        except ImportError:
+            pass
+    if not connection_string:
+        return {"ok": False, "error": "MONGODB_CONNECTION_STRING not set"}
+
+    start = time.perf_counter()
+    client = None
+    try:
+        from pymongo import MongoClient
+        client = MongoClient(
+            connection_string.replace('<db_password>', os.getenv('MONGODB_PASSWORD', '')),
+            serverSelectionTimeoutMS=timeout_ms,
+            connectTimeoutMS=timeout_ms,
+            socketTimeoutMS=timeout_ms
+        )
+        client.admin.command('ping')
+        return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+    except Exception as e:
+        return {"ok": False, "error": str(e)[:300]}
+    finally:
+        if client is not None:
+            client.close()
+
+
+def _count_files(directory: str, suffix: str, prefix: str = '') -> int:
+    try:
+        return len([f for f in os.listdir(directory) if f.startswith(prefix) and f.endswith(suffix)])
+    except OSError:
+        return 0
+
+
+def collect_status(mongodb: Optional[dict] = None) -> dict:
+    """Estado del container (el mismo formato que escribía el entrypoint, ampliado)"""
+    try:
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except OSError:
+        uptime = None
+
+    spool_dir = os.getenv('UPLOAD_SPOOL_DIR', os.path.join(BASE_DIR, 'spool'))
+    status = {
+        'timestamp': datetime.now().isoformat(),
+        'status': 'healthy',
+        'uptime_seconds': uptime,
+        'container_logs': _count_files(os.path.join(BASE_DIR, 'logs'), '.log'),
+        'scraped_files': _count_files(os.path.join(BASE_DIR, 'scraped_output'), '.json')
+                         + _count_files(os.path.join(BASE_DIR, 'scraped_output', 'runs'), '.json'),
+        'backup_files': _count_files(os.path.join(BASE_DIR, 'backups'), '.json')
+                        + _count_files(os.path.join(BASE_DIR, 'backups', 'store', 'snapshots'), '.manifest.gz'),
+        'spool_segments': _count_files(spool_dir, '.jsonl', 'segment_'),
+        'spool_failed': _count_files(spool_dir, '.jsonl', 'failed_'),
+    }
+    if mongodb is not None:
+        status['mongodb'] = mongodb
+        if not mongodb.get('ok'):
+            status['status'] = 'degraded'
+    return status
+
+
+def write_status(status: dict, path: str = STATUS_FILE):
+    """Escribir el estado de forma atómica para que el probe nunca lea un archivo a medias"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def check_cached(path: str = STATUS_FILE, max_age: float = DEFAULT_MAX_AGE) -> Tuple[str, str]:
+    """
+    Evaluar el estado cacheado
+
+    Returns:
+        (estado, mensaje)
+    """
+    try:
+        age = time.time() - os.stat(path).st_mtime
+        with open(path) as f:
+            status = json.load(f)
+    except (OSError, ValueError) as e:
+        return 'unhealthy', f"no status available ({e})"
+
+    if age > max_age:
+        return 'unhealthy', f"status is {age:.0f}s old (max {max_age:.0f}s)"
+
+    state = status.get('status', 'unhealthy')
+    detail = f"status {age:.0f}s old"
+    mongodb = status.get('mongodb')
+    if mongodb is not None:
+        if mongodb.get('ok'):
+            detail += f", mongodb ok {mongodb.get('latency_ms')}ms"
+        else:
+            detail += f", mongodb down: {mongodb.get('error')}"
+    if status.get('spool_segments'):
+        detail += f", {status['spool_segments']} spool segments pending"
+    if status.get('spool_failed'):
+        detail += f", {status['spool_failed']} failed spool segments"
+    return state, detail
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Container health check')
+    parser.add_argument('--ping', action='store_true', help='Ping MongoDB instead of reading the cached status')
+    parser.add_argument('--write-status', action='store_true', help='Collect and write the status file (resident process)')
+    parser.add_argument('--timeout-ms', type=int,
+                        default=int(os.getenv('HEALTHCHECK_TIMEOUT_MS', DEFAULT_PING_TIMEOUT_MS)))
+    parser.add_argument('--max-age', type=float, default=DEFAULT_MAX_AGE,
+                        help='Maximum age in seconds of the cached status')
+    parser.add_argument('--strict', action='store_true', help='Treat degraded (MongoDB down) as unhealthy')
+    parser.add_argument('--status-file', default=STATUS_FILE)
+    args = parser.parse_args()
+
+    if args.write_status:
+        mongodb = ping_mongodb(args.timeout_ms) if args.ping else None
+        status = collect_status(mongodb)
+        write_status(status, args.status_file)
+        state = status['status']
+        detail = json.dumps(mongodb) if mongodb is not None else 'status written'
+    elif args.ping:
+        mongodb = ping_mongodb(args.timeout_ms)
+        state = 'healthy' if mongodb['ok'] else 'degraded'
+        detail = f"mongodb ok {mongodb['latency_ms']}ms" if mongodb['ok'] else f"mongodb down: {mongodb['error']}"
+    else:
+        state, detail = check_cached(args.status_file, args.max_age)
+
+    print(f"{state}: {detail}")
+    if state == 'unhealthy' or (state == 'degraded' and args.strict):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""
+Caché en disco de respuestas HTTP para desarrollo y re-ejecuciones
+
+Las respuestas se guardan direccionadas por contenido de la petición
+(método + URL + parámetros) con el cuerpo comprimido y los validadores
+ETag/Last-Modified. La caché tiene TTL y se poda por tamaño en orden LRU.
+
+Modos (variable ARRYN_HTTP_CACHE):
+  - off:     sin caché (por defecto)
+  - on:      usa respuestas frescas, revalida las vencidas y guarda las nuevas
+  - offline: solo reproduce respuestas guardadas, nunca accede a la red
+
+La caché se consulta desde http_session.RateLimitedSession, así que solo la
+aprovechan los scrapers que hacen sus peticiones con get_session(); para los
+demás ARRYN_HTTP_CACHE no tiene efecto.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlencode
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_MODE_ENV_VAR = 'ARRYN_HTTP_CACHE'
+CACHE_DIR_ENV_VAR = 'ARRYN_HTTP_CACHE_DIR'
+CACHE_TTL_ENV_VAR = 'ARRYN_HTTP_CACHE_TTL'
+CACHE_MAX_MB_ENV_VAR = 'ARRYN_HTTP_CACHE_MAX_MB'
+
+CACHE_MODES = ('off', 'on', 'offline')
+DEFAULT_TTL = 6 * 3600
+DEFAULT_MAX_MB = 500
+EVICT_EVERY = 50
+
+# Cabeceras que no aplican a un cuerpo ya decodificado
+_SKIP_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length', 'connection'}
+
+
+class CacheEntry:
+    """Respuesta guardada en caché"""
+
+    __slots__ = ('status_code', 'headers', 'body', 'url', 'encoding', 'stored_at')
+
+    def __init__(self, status_code: int, headers: Dict[str, str], body: bytes, url: str,
+                 encoding: Optional[str], stored_at: float):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.url = url
+        self.encoding = encoding
+        self.stored_at = stored_at
+
+    def validators(self) -> Dict[str, str]:
+        """Cabeceras para una petición condicional"""
+        lowered = {k.lower(): v for k, v in self.headers.items()}
+        conditional = {}
+        if 'etag' in lowered:
+            conditional['If-None-Match'] = lowered['etag']
+        if 'last-modified' in lowered:
+            conditional['If-Modified-Since'] = lowered['last-modified']
+        return conditional
+
+
+class ResponseCache:
+    """
+    Caché de respuestas en disco con TTL y poda LRU por tamaño
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, mode: Optional[str] = None,
+                 ttl: Optional[float] = None, max_mb: Optional[float] = None):
+        self.mode = (mode or os.getenv(CACHE_MODE_ENV_VAR, 'off')).lower()
+        if self.mode not in CACHE_MODES:
+            raise ValueError(f"❌ Invalid cache mode '{self.mode}'. Use one of {CACHE_MODES}")
+
+        cache_dir = cache_dir or os.getenv(CACHE_DIR_ENV_VAR) or os.path.join(
+            tempfile.gettempdir(), 'arryn_http_cache'
+        )
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl if ttl is not None else float(os.getenv(CACHE_TTL_ENV_VAR, DEFAULT_TTL))
+        max_mb = max_mb if max_mb is not None else float(os.getenv(CACHE_MAX_MB_ENV_VAR, DEFAULT_MAX_MB))
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._stores = 0
+
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+    @property
+    def offline(self) -> bool:
+        return self.mode == 'offline'
+
+    @staticmethod
+    def cache_key(method: str, url: str, params: Any = None) -> str:
+        """Clave de la petición: hash de método, URL y parámetros ordenados"""
+        if isinstance(params, dict):
+            params = urlencode(sorted(params.items()), doseq=True)
+        elif params:
+            params = urlencode(sorted(params), doseq=True)
+        raw = f"{method.upper()} {url}?{params or ''}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        folder = self.cache_dir / key[:2]
+        return folder / f"{key}.json", folder / f"{key}.z"
+
+    def get(self, key: str) -> Tuple[Optional[CacheEntry], bool]:
+        """
+        Buscar una respuesta
+
+        Returns:
+            (entrada o None, True si la entrada sigue fresca)
+        """
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = zlib.decompress(f.read())
+            entry = CacheEntry(int(meta['status_code']), dict(meta['headers']), body, meta['url'],
+                               meta.get('encoding'), float(meta['stored_at']))
+        except OSError:
+            return None, False
+        except (ValueError, TypeError, KeyError, AttributeError, zlib.error) as e:
+            # Entrada corrupta o a medias: cuenta como fallo y se descarta
+            logger.warning(f"⚠️ Dropping malformed HTTP cache entry {key}: {e!r}")
+            meta_path.unlink(missing_ok=True)
+            body_path.unlink(missing_ok=True)
+            return None, False
+
+        # Marcar uso reciente para la poda LRU
+        now = time.time()
+        try:
+            os.utime(body_path, (now, now))
+        except OSError:
+            pass
+
+        return entry, self.offline or (now - entry.stored_at) < self.ttl
+
+    def put(self, key: str, status_code: int, headers: Dict[str, str], body: bytes, url: str,
+            encoding: Optional[str] = None):
+        """Guardar una respuesta (escritura atómica)"""
+        meta_path, body_path = self._paths(key)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+
+        meta = {
+            'url': url,
+            'status_code': status_code,
+            'headers': {k: v for k, v in headers.items() if k.lower() not in _SKIP_HEADERS},
+            'encoding': encoding,
+            'stored_at': time.time(),
+        }
+        self._atomic_write(body_path, zlib.compress(body, 6))
+        self._atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+
+        self._stores += 1
+        if self._stores % EVICT_EVERY == 0:
+            self.evict()
+
+    def touch(self, key: str):
+        """Renovar la fecha de una entrada revalidada (304)"""
+        meta_path, _ = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            meta['stored_at'] = time.time()
+            self._atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+        except (OSError, ValueError, TypeError):
+            pass
+
+    @staticmethod
+    def _atomic_write(path: Path, data: bytes):
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def evict(self) -> Dict[str, int]:
+        """
+        Eliminar entradas vencidas hace más de un TTL y, si la caché supera
+        max_bytes, las menos usadas recientemente
+        """
+        entries = []
+        total = 0
+        removed = 0
+        now = time.time()
+
+        for body_path in self.cache_dir.glob('*/*.z'):
+            meta_path = body_path.with_suffix('.json')
+            try:
+                st = body_path.stat()
+                size = st.st_size + (meta_path.stat().st_size if meta_path.exists() else 0)
+            except OSError:
+                continue
+            # Las entradas sin uso durante dos TTL no se revalidarán
+            if not self.offline and now - st.st_mtime > 2 * self.ttl:
+                body_path.unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
+                removed += 1
+                continue
+            entries.append((st.st_mtime, size, body_path, meta_path))
+            total += size
+
+        if total > self.max_bytes:
+            entries.sort()
+            for _, size, body_path, meta_path in entries:
+                if total <= self.max_bytes:
+                    break
+                body_path.unlink(missing_ok=True)
+                meta_path.unlink(missing_ok=True)
+                total -= size
+                removed += 1
+
+        if removed:
+            logger.info(f"🧹 HTTP cache: {removed} entries evicted, {total / 1024 / 1024:.1f} MB in use")
+        return {'removed': removed, 'bytes': total}
@@ -0,0 +1,130 @@
+"""
+Sesión HTTP compartida para los scrapers basados en requests
+
+Los scrapers (alkosto, exito) pueden usarla en lugar de requests.get:
+
+    from http_session import get_session
+    session = get_session()
+    response = session.get(url, timeout=30)
+
+La sesión reutiliza conexiones (keep-alive con pool por host), pasa cada
+petición por el DomainRateLimiter compartido y reintenta con backoff
+adaptativo las respuestas 429/5xx. Si ARRYN_HTTP_CACHE está activo, los GET
+se sirven desde la caché en disco (ver http_cache.py).
+
+Es opcional: los scrapers de scrapers/ se mantienen aparte y solo quedan
+limitados (y cacheados) cuando cambian sus requests.get por get_session().
+El orchestrator prepara el entorno (ARRYN_RATELIMIT_DIR, ARRYN_HTTP_CACHE,
+PYTHONPATH) para todos, pero no puede imponerlo a un scraper que no la usa.
+"""
+
+import logging
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+from http_cache import CacheEntry, ResponseCache
+from rate_limiter import BACKOFF_STATUS, DomainRateLimiter
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+    ),
+    'Accept-Language': 'es-CO,es;q=0.9',
+}
+
+
+class RateLimitedSession(requests.Session):
+    """
+    requests.Session con pool de conexiones y limitación de tasa por dominio
+    """
+
+    def __init__(self, limiter: Optional[DomainRateLimiter] = None, max_retries: int = 3,
+                 pool_maxsize: int = 10, cache: Optional[ResponseCache] = None):
+        super().__init__()
+        self.limiter = limiter or DomainRateLimiter()
+        self.cache = cache or ResponseCache()
+        self.max_retries = max_retries
+        self.headers.update(DEFAULT_HEADERS)
+
+        # Reintentos solo para errores de conexión; los de estado se manejan abajo
+        adapter = HTTPAdapter(
+            pool_connections=pool_maxsize,
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(total=max_retries, connect=max_retries, read=max_retries,
+                              status=0, backoff_factor=0.5),
+        )
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+
+    def request(self, method, url, *args, **kwargs):
+        """Ejecutar la petición pasando por la caché y el límite de tasa"""
+        if not self.cache.enabled or method.upper() != 'GET':
+            return self._request_limited(method, url, *args, **kwargs)
+
+        key = ResponseCache.cache_key(method, url, kwargs.get('params'))
+        entry, fresh = self.cache.get(key)
+        if entry is not None and fresh:
+            return _response_from_cache(entry)
+
+        if self.cache.offline:
+            raise requests.exceptions.ConnectionError(f"Offline HTTP cache miss: {url}")
+
+        # Revalidar la entrada vencida con ETag/Last-Modified
+        if entry is not None:
+            headers = dict(kwargs.pop('headers', None) or {})
+            headers.update(entry.validators())
+            kwargs['headers'] = headers
+
+        response = self._request_limited(method, url, *args, **kwargs)
+
+        if entry is not None and response.status_code == 304:
+            self.cache.touch(key)
+            return _response_from_cache(entry)
+        if response.status_code == 200:
+            self.cache.put(key, response.status_code, dict(response.headers), response.content,
+                           response.url, response.encoding)
+        return response
+
+    def _request_limited(self, method, url, *args, **kwargs):
+        """Ejecutar la petición respetando el límite de tasa del dominio"""
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(url)
+            response = super().request(method, url, *args, **kwargs)
+            self.limiter.report(url, response.status_code, response.headers.get('Retry-After'))
+
+            if response.status_code not in BACKOFF_STATUS or attempt == self.max_retries:
+                return response
+
+            logger.info(f"🔄 Retrying {url} after {response.status_code} (attempt {attempt + 1})")
+            response.close()
+        return response
+
+
+def _response_from_cache(entry: CacheEntry) -> requests.Response:
+    """Reconstruir un requests.Response a partir de una entrada de caché"""
+    response = requests.Response()
+    response.status_code = entry.status_code
+    response.headers = CaseInsensitiveDict(entry.headers)
+    response._content = entry.body
+    response.url = entry.url
+    response.encoding = entry.encoding
+    response.reason = 'OK (cached)'
+    return response
+
+
+_session: Optional[RateLimitedSession] = None
+
+
+def get_session() -> RateLimitedSession:
+    """Obtener la sesión compartida del proceso"""
+    global _session
+    if _session is None:
+        _session = RateLimitedSession()
+    return _session
@@ -0,0 +1,126 @@
+"""
+Lectura incremental de archivos JSON/JSONL de productos
+
+Permite recorrer archivos de salida de los scrapers sin cargarlos completos
+en memoria. Soporta:
+  - Arreglos JSON: [ {...}, {...} ]
+  - JSONL o valores JSON concatenados: {...}\\n{...}
+  - Un arreglo dentro de un objeto, como los backups: {"backup_info": {...}, "documents": [...]}
+"""
+
+import json
+from typing import Any, Iterator, TextIO
+
+CHUNK_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+
+class _Buffer:
+    """Buffer de texto que se rellena por bloques desde un archivo"""
+
+    def __init__(self, f: TextIO, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.data = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Leer un bloque más; descarta lo ya consumido. False si no hay más datos"""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.data = self.data[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip(self, chars: str = _WHITESPACE) -> str:
+        """Saltar caracteres y devolver el siguiente ('' al final del archivo)"""
+        while True:
+            while self.pos < len(self.data) and self.data[self.pos] in chars:
+                self.pos += 1
+            if self.pos < len(self.data):
+                return self.data[self.pos]
+            if not self.fill():
+                return ''
+
+    def decode(self) -> Any:
+        """Decodificar el siguiente valor JSON completo"""
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.data, self.pos)
+                # Un valor que termina justo en el borde puede estar truncado (p.ej. números)
+                if end == len(self.data) and not self.eof and self.fill():
+                    continue
+                self.pos = end
+                return value
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+
+
+def iter_json_records(f: TextIO) -> Iterator[Any]:
+    """
+    Iterar los registros de un archivo JSON/JSONL abierto en modo texto
+
+    Si el contenido es un arreglo se devuelven sus elementos; en caso contrario
+    cada valor de primer nivel es un registro.
+    """
+    buf = _Buffer(f)
+    first = buf.skip()
+    if not first:
+        return
+
+    if first == '[':
+        buf.pos += 1
+        while True:
+            c = buf.skip(_WHITESPACE + ',')
+            if c == ']' or not c:
+                return
+            yield buf.decode()
+    else:
+        while buf.skip():
+            yield buf.decode()
+
+
+def iter_json_key_array(f: TextIO, key: str) -> Iterator[Any]:
+    """
+    Iterar los elementos del arreglo bajo 'key' de un objeto JSON de primer nivel
+
+    Los demás valores del objeto se decodifican y descartan.
+    """
+    buf = _Buffer(f)
+    if buf.skip() != '{':
+        raise ValueError("Expected a JSON object")
+    buf.pos += 1
+
+    while True:
+        c = buf.skip(_WHITESPACE + ',')
+        if c == '}' or not c:
+            return
+        name = buf.decode()
+        if buf.skip() != ':':
+            raise ValueError(f"Expected ':' after key {name!r}")
+        buf.pos += 1
+
+        if buf.skip() == '[' and name == key:
+            buf.pos += 1
+            while True:
+                c = buf.skip(_WHITESPACE + ',')
+                if c == ']' or not c:
+                    break
+                yield buf.decode()
+            buf.pos += 1
+        else:
+            buf.decode()
+
+
+def iter_json_file(file_path: str) -> Iterator[Any]:
+    """Iterar los registros de un archivo JSON/JSONL por ruta"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        yield from iter_json_records(f)
@@ -1,21 +1,46 @@
 import json
 import os
 from datetime import datetime
-from typing import Dict, Any, List
-from pymongo import MongoClient
-from dotenv import load_dotenv
+from typing import Dict, Any, Iterator, List, Optional, Sequence
 import logging
 
+from backup_store import DEFAULT_STORE_DIR, BackupStore
+from columnar_export import PARTITION_KEYS, export_products, source_fields
+from json_stream import iter_json_key_array
+from snapshot_diff import SnapshotSource, diff_snapshots
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def convert_doc_for_json(doc):
+    """Convertir documento para serialización JSON (ObjectId y datetime a string)"""
+    if isinstance(doc, dict):
+        converted = {}
+        for key, value in doc.items():
+            if key == '_id':
+                converted[key] = str(value)
+            elif isinstance(value, datetime):
+                converted[key] = value.isoformat()
+            elif isinstance(value, dict):
+                converted[key] = convert_doc_for_json(value)
+            elif isinstance(value, list):
+                converted[key] = [convert_doc_for_json(item) if isinstance(item, dict) else item for item in value]
+            else:
+                converted[key] = value
+        return converted
+    return doc
+
 class MongoBackupManager:
     """
     Gestor para hacer backup y limpiar colecciones de MongoDB
     """
     
     def __init__(self):
+        # pymongo y dotenv solo cuando hace falta la base (--diff, --gc y
+        # --export desde archivos no la usan)
+        from dotenv import load_dotenv
+        from pymongo import MongoClient
         load_dotenv()
         
         self.connection_string = os.getenv('MONGODB_CONNECTION_STRING')
@@ -57,25 +82,6 @@ class MongoBackupManager:
             backup_filename = f"{collection_name}_backup_{timestamp}.json"
             backup_path = os.path.join(backup_folder, backup_filename)
             
-            # Convertir ObjectId y datetime a string para JSON serialization
-            def convert_doc_for_json(doc):
-                """Convertir documento para serialización JSON"""
-                if isinstance(doc, dict):
-                    converted = {}
-                    for key, value in doc.items():
-                        if key == '_id':
-                            converted[key] = str(value)
-                        elif isinstance(value, datetime):
-                            converted[key] = value.isoformat()
-                        elif isinstance(value, dict):
-                            converted[key] = convert_doc_for_json(value)
-                        elif isinstance(value, list):
-                            converted[key] = [convert_doc_for_json(item) if isinstance(item, dict) else item for item in value]
-                        else:
-                            converted[key] = value
-                    return converted
-                return doc
-            
             # Convertir todos los documentos
             documents = [convert_doc_for_json(doc) for doc in documents]
             
@@ -100,6 +106,57 @@ class MongoBackupManager:
             logger.error(f"❌ Backup failed: {e}")
             raise
     
+    def backup_collection_dedup(self, collection_name: str, store_dir: str = DEFAULT_STORE_DIR) -> Dict[str, Any]:
+        """
+        Hacer backup deduplicado: cada documento se guarda una vez por hash de
+        contenido y el snapshot es solo un manifiesto _id → hash
+        """
+        try:
+            store = BackupStore(store_dir)
+            collection = self.db[collection_name]
+            
+            logger.info(f"📦 Starting deduplicated backup of collection '{collection_name}'...")
+            # Ordenado por _id para que los manifiestos se puedan comparar por merge
+            cursor = collection.find().sort('_id', 1)
+            result = store.snapshot(
+                collection_name,
+                (convert_doc_for_json(doc) for doc in cursor),
+                {"database_name": self.database_name}
+            )
+            
+            if result["total_documents"] == 0:
+                logger.warning(f"⚠️ Collection '{collection_name}' is empty")
+            
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Backup failed: {e}")
+            raise
+    
+    def live_source(self, collection_name: str) -> SnapshotSource:
+        """Fuente de diff sobre la colección en vivo, ordenada por _id"""
+        collection = self.db[collection_name]
+        return SnapshotSource.from_documents(
+            lambda: (convert_doc_for_json(doc) for doc in collection.find().sort('_id', 1)),
+            True,
+            f"live:{collection_name}"
+        )
+    
+    def iter_documents(self, collection_name: str, fields: Optional[Sequence[str]] = None,
+                       batch_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        """
+        Recorrer la colección en streaming, enviando la proyección a MongoDB
+        para que solo viajen los campos pedidos
+        """
+        projection = None
+        if fields is not None:
+            projection = {field: 1 for field in fields}
+            if '_id' not in fields:
+                projection['_id'] = 0
+        cursor = self.db[collection_name].find({}, projection, batch_size=batch_size)
+        for doc in cursor:
+            yield convert_doc_for_json(doc)
+    
     def get_collection_stats(self, collection_name: str) -> Dict[str, Any]:
         """
         Obtener estadísticas de una colección
@@ -155,15 +212,22 @@ class MongoBackupManager:
             logger.error(f"❌ Clear collection failed: {e}")
             raise
     
-    def backup_and_clear(self, collection_name: str, confirm_clear: bool = False) -> Dict[str, Any]:
+    def backup_and_clear(self, collection_name: str, confirm_clear: bool = False,
+                         full_json: bool = False, store_dir: str = DEFAULT_STORE_DIR) -> Dict[str, Any]:
         """
         Hacer backup y luego limpiar la colección
+        
+        El backup es un snapshot deduplicado en store_dir; con full_json se
+        escribe en su lugar el volcado JSON completo en backups/.
         """
         results = {}
         
         # 1. Hacer backup
         logger.info("🔄 Step 1: Creating backup...")
-        backup_path = self.backup_collection(collection_name)
+        if full_json:
+            backup_path = self.backup_collection(collection_name)
+        else:
+            backup_path = self.backup_collection_dedup(collection_name, store_dir)["manifest"]
         results["backup_path"] = backup_path
         
         # 2. Obtener estadísticas antes del borrado
@@ -187,6 +251,73 @@ class MongoBackupManager:
             self.client.close()
             logger.info("🔌 MongoDB connection closed")
 
+def resolve_diff_source(spec: str, collection_name: str, store_dir: str,
+                        manager: Optional[MongoBackupManager] = None) -> SnapshotSource:
+    """
+    Resolver una fuente de diff:
+      - 'live': la colección en vivo
+      - 'latest': el snapshot deduplicado más reciente de la colección
+      - *.manifest.gz: un snapshot deduplicado
+      - otro: un backup JSON clásico
+    """
+    if spec == 'live':
+        return manager.live_source(collection_name)
+    if spec == 'latest' or spec.endswith('.manifest.gz'):
+        store = BackupStore(store_dir)
+        if spec == 'latest':
+            snapshots = store.list_snapshots(collection_name)
+            if not snapshots:
+                raise ValueError(f"❌ No deduplicated snapshots found for '{collection_name}' in {store_dir}")
+            spec = str(snapshots[-1])
+        return SnapshotSource.from_manifest(spec, store)
+    return SnapshotSource.from_backup_file(spec)
+
+def iter_export_documents(spec: str, collection_name: str, store_dir: str,
+                          manager: Optional[MongoBackupManager] = None,
+                          fields: Optional[Sequence[str]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Documentos a exportar desde 'live', 'latest', un manifiesto o un backup JSON
+    (mismas fuentes que --diff), recortados a los campos pedidos
+    """
+    if spec == 'live':
+        yield from manager.iter_documents(collection_name, fields)
+        return
+    if spec == 'latest' or spec.endswith('.manifest.gz'):
+        # iter_snapshot reincorpora created_at/updated_at, que no están en los blobs
+        source = resolve_diff_source(spec, collection_name, store_dir)
+        for doc in BackupStore(store_dir).iter_snapshot(source.name):
+            yield doc if fields is None else {k: doc[k] for k in fields if k in doc}
+        return
+    with open(spec, 'r', encoding='utf-8') as f:
+        for doc in iter_json_key_array(f, 'documents'):
+            yield doc if fields is None else {k: doc[k] for k in fields if k in doc}
+
+def print_diff_summary(summary: Dict[str, Any]):
+    print(f"\n🔍 Snapshot diff ({summary['method']} join):")
+    print(f"   Old: {summary['left']}")
+    print(f"   New: {summary['right']}")
+    print(f"   ➕ Added:     {summary['added']}")
+    print(f"   ➖ Removed:   {summary['removed']}")
+    print(f"   ✏️  Changed:   {summary['changed']}")
+    print(f"   ✅ Unchanged: {summary['unchanged']}")
+    if summary['changed_fields']:
+        campos = sorted(summary['changed_fields'].items(), key=lambda kv: -kv[1])
+        print(f"   Changed fields: {', '.join(f'{k} ({v})' for k, v in campos[:10])}")
+    if summary['top_price_changes']:
+        print(f"\n💲 Price changes: {summary['price_changes']} (largest first)")
+        for change in summary['top_price_changes']:
+            pct = f" ({change['pct']:+.2f}%)" if change['pct'] is not None else ""
+            print(f"   {change['_id']}: {change['old']} → {change['new']}{pct}")
+
+def apply_store_retention(args):
+    """Aplicar --keep-last/--keep-days tras un snapshot y borrar los blobs huérfanos"""
+    if args.keep_last is None and args.keep_days is None:
+        return
+    store = BackupStore(args.store_dir)
+    store.apply_retention(args.keep_last, args.keep_days, args.collection)
+    store.gc()
+
+
 def main():
     """
     Función principal
@@ -202,9 +333,83 @@ def main():
                        help='Confirm that you want to clear the collection')
     parser.add_argument('--stats-only', action='store_true',
                        help='Only show collection statistics')
+    parser.add_argument('--full-json', action='store_true',
+                       help='Write a full JSON dump to backups/ instead of a deduplicated snapshot')
+    parser.add_argument('--dedup', action='store_true',
+                       help='Deduplicated snapshot in --store-dir (the default; kept for existing scripts)')
+    parser.add_argument('--store-dir', type=str, default=DEFAULT_STORE_DIR,
+                       help='Content-addressed backup store directory')
+    parser.add_argument('--keep-last', type=int, default=None,
+                       help='Retention: keep the N most recent dedup snapshots per collection')
+    parser.add_argument('--keep-days', type=int, default=None,
+                       help='Retention: keep dedup snapshots younger than N days')
+    parser.add_argument('--gc', action='store_true',
+                       help='Apply retention and remove unreferenced blobs from the backup store')
+    parser.add_argument('--diff', nargs=2, metavar=('OLD', 'NEW'),
+                       help="Compare two snapshots: backup .json, dedup .manifest.gz, 'latest' or 'live'")
+    parser.add_argument('--diff-output', type=str, default=None,
+                       help='Write every added/removed/changed product to this JSONL file')
+    parser.add_argument('--export', type=str, default=None, metavar='OUTPUT_DIR',
+                       help='Export to a partitioned columnar dataset (Parquet if pyarrow is installed)')
+    parser.add_argument('--export-source', type=str, default='live',
+                       help="Export source: 'live', 'latest', a dedup .manifest.gz or a backup .json")
+    parser.add_argument('--fields', type=str, default=None,
+                       help='Comma-separated columns to export (default: all product fields)')
+    parser.add_argument('--partition-by', type=str, default=','.join(PARTITION_KEYS),
+                       help="Comma-separated partition keys among 'fuente,fecha', or 'none'")
+    parser.add_argument('--format', type=str, default='auto', choices=['auto', 'parquet', 'acol'],
+                       help='Export format (auto: parquet if pyarrow is available, else acol)')
     
     args = parser.parse_args()
     
+    if args.export:
+        fields = [f.strip() for f in args.fields.split(',') if f.strip()] if args.fields else None
+        partition_by = [] if args.partition_by == 'none' else \
+            [k.strip() for k in args.partition_by.split(',') if k.strip()]
+        # Solo se conecta a MongoDB si se exporta la colección en vivo
+        manager = MongoBackupManager() if args.export_source == 'live' else None
+        try:
+            documents = iter_export_documents(args.export_source, args.collection, args.store_dir,
+                                              manager, source_fields(fields, partition_by))
+            summary = export_products(documents, args.export, fields, partition_by, args.format,
+                                      source=args.export_source)
+            print(f"\n📊 Export completed: {summary['output_dir']}")
+            print(f"   Format: {summary['format']}")
+            print(f"   Rows: {summary['rows']}, partitions: {summary['partitions']}, files: {summary['files']}")
+            print(f"   Size: {summary['bytes'] / 1024:.1f} KB")
+            for name, failed in summary['coercion_failures'].items():
+                print(f"   ⚠️  {name}: {failed} values not convertible, exported as null")
+        finally:
+            if manager is not None:
+                manager.close()
+        return
+    
+    if args.diff:
+        # Solo se conecta a MongoDB si una de las fuentes es la colección en vivo
+        manager = MongoBackupManager() if 'live' in args.diff else None
+        try:
+            old = resolve_diff_source(args.diff[0], args.collection, args.store_dir, manager)
+            new = resolve_diff_source(args.diff[1], args.collection, args.store_dir, manager)
+            summary = diff_snapshots(old, new, args.diff_output)
+            print_diff_summary(summary)
+            if args.diff_output:
+                print(f"\n📝 Details written to {args.diff_output}")
+        finally:
+            if manager is not None:
+                manager.close()
+        return
+    
+    if args.gc:
+        # No requiere conexión a MongoDB
+        store = BackupStore(args.store_dir)
+        removed = store.apply_retention(args.keep_last, args.keep_days)
+        gc_stats = store.gc()
+        print(f"\n🧹 Backup store cleanup:")
+        print(f"   Snapshots removed: {len(removed)}")
+        print(f"   Blobs removed: {gc_stats['removed']} ({gc_stats['freed_bytes'] / 1024:.1f} KB)")
+        return
+    
+    manager = None
     try:
         manager = MongoBackupManager()
         
@@ -222,11 +427,18 @@ def main():
                     print(f"   Document {i} ({sample['document_id']}):")
                     print(f"     Fields ({sample['field_count']}): {', '.join(sample['fields'][:10])}{'...' if sample['field_count'] > 10 else ''}")
         
-        elif args.backup_only:
-            # Solo hacer backup
+        elif args.backup_only and args.full_json:
+            # Volcado JSON completo (formato anterior)
             backup_path = manager.backup_collection(args.collection)
             print(f"\n✅ Backup completed: {backup_path}")
         
+        elif args.backup_only:
+            # Backup deduplicado: los productos sin cambios no se vuelven a guardar
+            result = manager.backup_collection_dedup(args.collection, args.store_dir)
+            print(f"\n✅ Snapshot completed: {result['manifest']}")
+            print(f"   Documents: {result['total_documents']}, new blobs: {result['new_blobs']} ({result['new_bytes'] / 1024:.1f} KB)")
+            apply_store_retention(args)
+        
         else:
             # Backup y limpiar
             if not args.confirm_clear:
@@ -235,7 +447,10 @@ def main():
                 print("Use --backup-only to create backup without deletion")
                 return
             
-            results = manager.backup_and_clear(args.collection, args.confirm_clear)
+            results = manager.backup_and_clear(args.collection, args.confirm_clear,
+                                               args.full_json, args.store_dir)
+            if not args.full_json:
+                apply_store_retention(args)
             
             print(f"\n🎉 Process completed:")
             print(f"   Backup: {results['backup_path']}")
@@ -249,7 +464,8 @@ def main():
         logger.error(f"❌ Process failed: {e}")
     
     finally:
-        manager.close()
+        if manager is not None:
+            manager.close()
 
 if __name__ == "__main__":
     main()
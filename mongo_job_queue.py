@@ -0,0 +1,273 @@
+"""
+Cola de trabajos de scraping compartida en MongoDB para varios nodos
+
+Misma interfaz que crawl_queue.CrawlQueue, pero las unidades viven en una
+colección de MongoDB (por defecto 'scrape_jobs'), de modo que varios
+orchestrators en distintos hosts pueden trabajar sobre el mismo plan:
+
+  - lease atómico con find_one_and_update (un trabajo nunca se entrega a dos nodos)
+  - heartbeats que extienden el lease mientras el scraper corre
+  - los leases vencidos vuelven a quedar pendientes (o fallidos tras max_attempts)
+  - el resultado de cada trabajo se guarda en el mismo documento
+
+Para probar en local basta un mongod y MONGODB_CONNECTION_STRING=mongodb://localhost:27017
+"""
+
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+import logging
+
+from dotenv import load_dotenv
+from pymongo import ASCENDING, MongoClient, ReturnDocument, UpdateOne
+
+from crawl_queue import DEFAULT_MAX_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS_COLLECTION = 'scrape_jobs'
+DEFAULT_LEASE_SECONDS = 120
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def job_id(unit: Dict[str, Any]) -> str:
+    """ID determinístico del trabajo, para que planificar dos veces no lo duplique"""
+    return f"{unit['retailer']}|{unit['categoria']}|{unit['page_start']}-{unit['page_end']}"
+
+
+class MongoJobQueue:
+    """
+    Cola de trabajos con leases sobre una colección de MongoDB
+    """
+
+    def __init__(self, collection, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS, client: Optional[MongoClient] = None):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.client = client
+
+        self.collection.create_index([("status", ASCENDING), ("retailer", ASCENDING),
+                                      ("categoria", ASCENDING), ("page_start", ASCENDING)])
+        self.collection.create_index([("status", ASCENDING), ("lease_expires", ASCENDING)])
+
+    @classmethod
+    def from_env(cls, collection_name: Optional[str] = None, **kwargs) -> 'MongoJobQueue':
+        """Crear la cola usando las mismas variables de entorno que ProductUploader"""
+        load_dotenv()
+        connection_string = os.getenv('MONGODB_CONNECTION_STRING')
+        db_password = os.getenv('MONGODB_PASSWORD', '')
+        database_name = os.getenv('DATABASE_NAME', 'smartcompare_ai')
+        collection_name = collection_name or os.getenv('JOBS_COLLECTION_NAME', DEFAULT_JOBS_COLLECTION)
+
+        if not connection_string:
+            raise ValueError("❌ MongoDB connection string must be set in .env file")
+
+        client = MongoClient(connection_string.replace('<db_password>', db_password),
+                             serverSelectionTimeoutMS=10000)
+        client.admin.command('ping')
+        logger.info(f"✅ Connected to MongoDB job queue '{collection_name}'")
+        return cls(client[database_name][collection_name], client=client, **kwargs)
+
+    @staticmethod
+    def _to_unit(doc: Dict[str, Any]) -> Dict[str, Any]:
+        unit = dict(doc)
+        unit["id"] = unit.pop("_id")
+        return unit
+
+    def add_units(self, units: List[Dict[str, Any]]) -> int:
+        """
+        Registrar trabajos; los existentes conservan su estado
+
+        Returns:
+            Número de trabajos nuevos
+        """
+        if not units:
+            return 0
+        now = _now()
+        operations = [
+            UpdateOne(
+                {"_id": job_id(u)},
+                {"$setOnInsert": {
+                    "retailer": u["retailer"],
+                    "categoria": u["categoria"],
+                    "page_start": u["page_start"],
+                    "page_end": u["page_end"],
+                    "status": "pending",
+                    "attempts": 0,
+                    "max_attempts": self.max_attempts,
+                    "created_at": now,
+                    "updated_at": now
+                }},
+                upsert=True
+            )
+            for u in units
+        ]
+        result = self.collection.bulk_write(operations, ordered=False)
+        return result.upserted_count
+
+    def _expire_leases(self, now: datetime):
+        """Devolver a pendientes (o fallidos) los trabajos con lease vencido"""
+        expired = {"status": "leased", "lease_expires": {"$lt": now}}
+        self.collection.update_many(
+            expired,
+            [
+                {"$set": {
+                    "status": {"$cond": [{"$gte": ["$attempts", "$max_attempts"]}, "failed", "pending"]},
+                    "last_error": "lease expired",
+                    "updated_at": now
+                }},
+                {"$project": {"lease_owner": 0, "lease_expires": 0}}
+            ]
+        )
+
+    def _retailer_order(self) -> List[str]:
+        """Retailers con trabajo pendiente, del menos al más atendido"""
+        pipeline = [
+            {"$match": {"status": {"$in": ["pending", "leased"]}}},
+            {"$group": {
+                "_id": "$retailer",
+                "pending": {"$sum": {"$cond": [{"$eq": ["$status", "pending"]}, 1, 0]}},
+                "in_flight": {"$sum": {"$cond": [{"$eq": ["$status", "leased"]}, 1, 0]}},
+                "last_leased": {"$max": "$leased_at"}
+            }},
+            {"$match": {"pending": {"$gt": 0}}},
+            {"$sort": {"in_flight": 1, "last_leased": 1, "_id": 1}}
+        ]
+        return [row["_id"] for row in self.collection.aggregate(pipeline)]
+
+    def lease(self, owner: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Tomar atómicamente el siguiente trabajo pendiente
+
+        Returns:
+            Trabajo como dict (con 'id'), o None si no hay trabajo pendiente
+        """
+        owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        now = _now()
+        self._expire_leases(now)
+
+        for retailer in self._retailer_order():
+            doc = self.collection.find_one_and_update(
+                {"status": "pending", "retailer": retailer},
+                {
+                    "$set": {
+                        "status": "leased",
+                        "lease_owner": owner,
+                        "lease_expires": now + timedelta(seconds=self.lease_seconds),
+                        "leased_at": now,
+                        "heartbeat_at": now,
+                        "updated_at": now
+                    },
+                    "$inc": {"attempts": 1}
+                },
+                sort=[("categoria", ASCENDING), ("page_start", ASCENDING)],
+                return_document=ReturnDocument.AFTER
+            )
+            # Otro nodo pudo tomar el último trabajo del retailer; probar el siguiente
+            if doc is not None:
+                return self._to_unit(doc)
+        return None
+
+    def heartbeat(self, unit_id: str, owner: str) -> bool:
+        """
+        Extender el lease de un trabajo en curso
+
+        Returns:
+            False si el lease ya no pertenece a owner
+        """
+        now = _now()
+        result = self.collection.update_one(
+            {"_id": unit_id, "status": "leased", "lease_owner": owner},
+            {"$set": {
+                "lease_expires": now + timedelta(seconds=self.lease_seconds),
+                "heartbeat_at": now
+            }}
+        )
+        return result.matched_count == 1
+
+    def release_dead_leases(self) -> int:
+        """Liberar leases de procesos muertos en este mismo host"""
+        host = socket.gethostname()
+        released = 0
+        for owner in self.collection.distinct("lease_owner", {"status": "leased"}):
+            if not owner or not owner.startswith(f"{host}:"):
+                continue
+            try:
+                os.kill(int(owner.rsplit(':', 1)[1]), 0)
+                continue  # Proceso vivo
+            except ProcessLookupError:
+                pass
+            except (ValueError, PermissionError):
+                continue
+            result = self.collection.update_many(
+                {"status": "leased", "lease_owner": owner},
+                [
+                    {"$set": {
+                        "status": {"$cond": [{"$gte": ["$attempts", "$max_attempts"]}, "failed", "pending"]},
+                        "last_error": "worker died",
+                        "updated_at": _now()
+                    }},
+                    {"$project": {"lease_owner": 0, "lease_expires": 0}}
+                ]
+            )
+            released += result.modified_count
+        if released:
+            logger.info(f"♻️ Released {released} leases from dead workers")
+        return released
+
+    def complete(self, unit_id: str, output_file: Optional[str] = None,
+                 result: Optional[Dict[str, Any]] = None, owner: Optional[str] = None):
+        """Reportar un trabajo terminado con su resultado"""
+        query = {"_id": unit_id}
+        if owner:
+            query["lease_owner"] = owner
+        self.collection.update_one(
+            query,
+            {
+                "$set": {
+                    "status": "done",
+                    "output_file": output_file,
+                    "result": result,
+                    "host": socket.gethostname(),
+                    "finished_at": _now(),
+                    "updated_at": _now()
+                },
+                "$unset": {"lease_owner": "", "lease_expires": "", "last_error": ""}
+            }
+        )
+
+    def fail(self, unit_id: str, error: str, owner: Optional[str] = None):
+        """Registrar un fallo; el trabajo se reintenta hasta max_attempts"""
+        query = {"_id": unit_id}
+        if owner:
+            query["lease_owner"] = owner
+        self.collection.update_one(
+            query,
+            [
+                {"$set": {
+                    "status": {"$cond": [{"$gte": ["$attempts", "$max_attempts"]}, "failed", "pending"]},
+                    "last_error": error[:1000],
+                    "host": socket.gethostname(),
+                    "updated_at": _now()
+                }},
+                {"$project": {"lease_owner": 0, "lease_expires": 0}}
+            ]
+        )
+
+    def reset(self) -> int:
+        """Eliminar trabajos terminados o fallidos para empezar un crawl nuevo"""
+        return self.collection.delete_many({"status": {"$in": ["done", "failed"]}}).deleted_count
+
+    def stats(self) -> Dict[str, int]:
+        """Conteo de trabajos por estado"""
+        pipeline = [{"$group": {"_id": "$status", "n": {"$sum": 1}}}]
+        return {row["_id"]: row["n"] for row in self.collection.aggregate(pipeline)}
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
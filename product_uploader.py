@@ -1,36 +1,50 @@
 import json
 import os
 import logging
+import threading
+from collections import deque
 from datetime import datetime
-from typing import Dict, Any, List, Optional
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure, DuplicateKeyError
-from dotenv import load_dotenv
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 import hashlib
+from itertools import islice
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from json_stream import iter_json_file
+from product_dedup import DEFAULT_WINDOW, dedup_products
+from product_record import InvalidProductError, as_dict, to_record
+from upload_spool import UploadSpool
+
+# El logging se configura en main(); al importar el módulo no se toca la
+# configuración global
 logger = logging.getLogger(__name__)
 
+# pymongo y bson se importan dentro de las funciones que los usan, así que
+# importar el módulo (healthcheck, ejemplo_uso) no los carga
+
 class MongoDBManager:
     """
     Gestor de conexión y operaciones con MongoDB Atlas
     """
     
-    def __init__(self, connection_string: str, db_password: str, database_name: str = "smartcompare_ai"):
+    def __init__(self, connection_string: str, db_password: str, database_name: str = "smartcompare_ai",
+                 timeout_ms: Optional[int] = None):
         self.connection_string = connection_string.replace('<db_password>', db_password)
         self.database_name = database_name
+        # Tiempo máximo para considerar Atlas no disponible
+        self.timeout_ms = timeout_ms or int(os.getenv('MONGODB_TIMEOUT_MS', '10000'))
         self.client = None
         self.db = None
         self.connect()
     
     def connect(self):
         """Establecer conexión con MongoDB Atlas"""
+        from pymongo import MongoClient
+        from pymongo.errors import ConnectionFailure
         try:
-            self.client = MongoClient(self.connection_string)
+            self.client = MongoClient(
+                self.connection_string,
+                serverSelectionTimeoutMS=self.timeout_ms,
+                connectTimeoutMS=self.timeout_ms
+            )
             # Verificar conexión
             self.client.admin.command('ping')
             self.db = self.client[self.database_name]
@@ -43,7 +57,8 @@ class MongoDBManager:
         """Obtener referencia a una colección específica"""
         return self.db[collection_name]
     
-    def parse_price(self, precio_texto: str) -> float:
+    @staticmethod
+    def parse_price(precio_texto: str) -> float:
         """Extraer valor numérico del precio"""
         try:
             # Remover texto no numérico y convertir
@@ -52,14 +67,16 @@ class MongoDBManager:
         except (ValueError, AttributeError):
             return 0.0
     
-    def parse_rating(self, calificacion: str) -> float:
+    @staticmethod
+    def parse_rating(calificacion: str) -> float:
         """Convertir calificación a float"""
         try:
             return float(calificacion) if calificacion else 0.0
         except (ValueError, AttributeError):
             return 0.0
     
-    def calcular_hash_producto(self, producto: Dict[str, Any]) -> str:
+    @staticmethod
+    def calcular_hash_producto(producto: Dict[str, Any]) -> str:
         """Generar hash único del producto basado en campos clave"""
         campos_hash = [
             producto.get('titulo', '').lower().strip(),
@@ -70,6 +87,60 @@ class MongoDBManager:
         hash_string = '|'.join(campos_hash)
         return hashlib.sha256(hash_string.encode('utf-8')).hexdigest()
     
+    @staticmethod
+    def build_product_doc(producto: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Construir el documento MongoDB de un producto con propiedades en español
+        
+        No usa la conexión, así que puede ejecutarse en procesos de
+        UploadWorkerPool.
+        
+        Args:
+            producto: Diccionario con datos del producto usando nombres en español
+            
+        Returns:
+            Documento listo para replace_one/ReplaceOne
+        """
+        # Generar ID único del producto basado en la fuente y contador
+        fuente = producto.get('fuente', 'unknown')
+        contador = producto.get('contador_extraccion', '')
+        product_id = f"{fuente}_{contador}"
+        
+        # Generar hash único del producto
+        product_hash = MongoDBManager.calcular_hash_producto(producto)
+        
+        # ✅ NUEVA IMPLEMENTACIÓN: Documento del producto con nombres EN ESPAÑOL
+        return {
+            "_id": product_id,
+            "product_id": product_id,
+            "product_hash": product_hash,
+            
+            # Campos de control (sin cambios)
+            "contador_extraccion_total": producto.get('contador_extraccion_total', 0),
+            "contador_extraccion": producto.get('contador_extraccion', 0),
+            
+            # ✅ CAMPOS EN ESPAÑOL - Mapeo directo sin traducción
+            "titulo": producto.get('titulo', ''),                        # antes: "name" 
+            "marca": producto.get('marca', ''),                          # antes: "brand"
+            "categoria": producto.get('categoria', ''),                  # antes: "category"
+            "precio_texto": producto.get('precio_texto', ''),            # antes: "price_text"
+            "precio_valor": producto.get('precio_valor', 0),             # antes: "price_value"
+            "moneda": producto.get('moneda', 'COP'),                     # antes: "currency"
+            "tamaño": producto.get('tamaño', ''),                        # antes: "size"
+            "calificacion": MongoDBManager.parse_rating(producto.get('calificacion', '')),  # antes: "rating"
+            "detalles_adicionales": producto.get('detalles_adicionales', ''),     # antes: "additional_details"
+            "fuente": producto.get('fuente', ''),                        # antes: "source"
+            "imagen": producto.get('imagen', ''),                        # antes: "image_url"
+            "link": producto.get('link', ''),                            # antes: "product_link"
+            "pagina": producto.get('pagina', 1),                         # antes: "page"
+            "fecha_extraccion": producto.get('fecha_extraccion', ''),    # antes: "extraction_date"
+            "extraction_status": producto.get('extraction_status', ''), # mantiene nombre original
+            
+            # Timestamps de control (sin cambios)
+            "created_at": datetime.now(),
+            "updated_at": datetime.now()
+        }
+    
     def save_product(self, producto: Dict[str, Any], collection_name: str = "products") -> bool:
         """
         Guardar producto en MongoDB con propiedades en español (NUEVA IMPLEMENTACIÓN)
@@ -80,49 +151,16 @@ class MongoDBManager:
             
         Returns:
             bool: True si el producto se guardó exitosamente
+            
+        Raises:
+            ConnectionFailure: si se pierde la conexión, para que el llamador
+                pueda enviar el producto al spool
         """
+        from pymongo.errors import ConnectionFailure
+        product_id = f"{producto.get('fuente', 'unknown')}_{producto.get('contador_extraccion', '')}"
         try:
             collection = self.get_collection(collection_name)
-        
-            # Generar ID único del producto basado en la fuente y contador
-            fuente = producto.get('fuente', 'unknown')
-            contador = producto.get('contador_extraccion', '')
-            product_id = f"{fuente}_{contador}"
-            
-            # Generar hash único del producto
-            product_hash = self.calcular_hash_producto(producto)
-            
-            # ✅ NUEVA IMPLEMENTACIÓN: Documento del producto con nombres EN ESPAÑOL
-            product_doc = {
-                "_id": product_id,
-                "product_id": product_id,
-                "product_hash": product_hash,
-                
-                # Campos de control (sin cambios)
-                "contador_extraccion_total": producto.get('contador_extraccion_total', 0),
-                "contador_extraccion": producto.get('contador_extraccion', 0),
-                
-                # ✅ CAMPOS EN ESPAÑOL - Mapeo directo sin traducción
-                "titulo": producto.get('titulo', ''),                        # antes: "name" 
-                "marca": producto.get('marca', ''),                          # antes: "brand"
-                "categoria": producto.get('categoria', ''),                  # antes: "category"
-                "precio_texto": producto.get('precio_texto', ''),            # antes: "price_text"
-                "precio_valor": producto.get('precio_valor', 0),             # antes: "price_value"
-                "moneda": producto.get('moneda', 'COP'),                     # antes: "currency"
-                "tamaño": producto.get('tamaño', ''),                        # antes: "size"
-                "calificacion": self.parse_rating(producto.get('calificacion', '')),  # antes: "rating"
-                "detalles_adicionales": producto.get('detalles_adicionales', ''),     # antes: "additional_details"
-                "fuente": producto.get('fuente', ''),                        # antes: "source"
-                "imagen": producto.get('imagen', ''),                        # antes: "image_url"
-                "link": producto.get('link', ''),                            # antes: "product_link"
-                "pagina": producto.get('pagina', 1),                         # antes: "page"
-                "fecha_extraccion": producto.get('fecha_extraccion', ''),    # antes: "extraction_date"
-                "extraction_status": producto.get('extraction_status', ''), # mantiene nombre original
-                
-                # Timestamps de control (sin cambios)
-                "created_at": datetime.now(),
-                "updated_at": datetime.now()
-            }
+            product_doc = self.build_product_doc(producto)
             
             # Insertar o actualizar el documento
             result = collection.replace_one(
@@ -141,6 +179,8 @@ class MongoDBManager:
                 logger.info(f"ℹ️ Product unchanged: {product_id}")
                 return True
                 
+        except ConnectionFailure:
+            raise
         except Exception as e:
             logger.error(f"❌ Error saving product {product_id}: {e}")
             return False
@@ -149,6 +189,7 @@ class MongoDBManager:
         """
         Guardar múltiples productos en lote
         """
+        from pymongo.errors import ConnectionFailure
         stats = {"inserted": 0, "updated": 0, "errors": 0}
         
         for producto in productos:
@@ -157,25 +198,215 @@ class MongoDBManager:
                     stats["inserted"] += 1
                 else:
                     stats["errors"] += 1
+            except ConnectionFailure:
+                raise
             except Exception as e:
                 logger.error(f"Error processing product: {e}")
                 stats["errors"] += 1
         
         return stats
     
+    def save_products_bulk(self, productos: List[Dict[str, Any]], collection_name: str = "products") -> Dict[str, Any]:
+        """
+        Guardar productos con bulk_write de upserts (usado al drenar el spool)
+        
+        La escritura es ordenada: si el spool tiene dos versiones del mismo
+        producto se aplican en el orden en que se encolaron. Un producto que
+        falla se registra como error y el resto del lote sigue escribiéndose.
+        
+        Returns:
+            Contadores inserted/updated/errors y 'failed': (posición en
+            productos, error) de cada producto que no se escribió
+        """
+        from pymongo import ReplaceOne
+        from pymongo.errors import BulkWriteError
+        stats = {"inserted": 0, "updated": 0, "errors": 0, "failed": []}
+        pending = []  # (posición en productos, _id) de cada operación
+        operations = []
+        for i, producto in enumerate(productos):
+            try:
+                doc = self.build_product_doc(producto)
+            except Exception as e:
+                logger.error(f"❌ Error replaying product: {e}")
+                stats["errors"] += 1
+                stats["failed"].append((i, str(e)))
+                continue
+            pending.append((i, doc["_id"]))
+            operations.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+        
+        collection = self.get_collection(collection_name)
+        while operations:
+            try:
+                result = collection.bulk_write(operations, ordered=True)
+                stats["inserted"] += result.upserted_count
+                stats["updated"] += result.modified_count
+                break
+            except BulkWriteError as e:
+                # Una escritura ordenada se detiene en el primer error: saltarlo y seguir
+                details = e.details
+                error = details["writeErrors"][0]
+                stats["inserted"] += details.get("nUpserted", 0)
+                stats["updated"] += details.get("nModified", 0)
+                stats["errors"] += 1
+                position, product_id = pending[error['index']]
+                stats["failed"].append((position, error.get('errmsg')))
+                logger.error(f"❌ Error replaying product {product_id}: {error.get('errmsg')}")
+                pending = pending[error['index'] + 1:]
+                operations = operations[error['index'] + 1:]
+        return stats
+    
+    def write_encoded(self, documents: List[Tuple[str, bytes]], collection_name: str = "products") -> Dict[str, int]:
+        """
+        Escribir documentos ya codificados en BSON (ver encode_product_docs)
+        con un único bulk_write de upserts
+        
+        Como en save_products_batch, gana la última versión de cada _id del
+        lote y 'inserted' cuenta los productos guardados (nuevos, actualizados
+        o sin cambios), de modo que las estadísticas no dependen de workers.
+        """
+        from bson.raw_bson import RawBSONDocument
+        from pymongo import ReplaceOne
+        from pymongo.errors import BulkWriteError
+        if not documents:
+            return {"inserted": 0, "updated": 0, "errors": 0}
+        
+        # bulk_write(ordered=False) no garantiza el orden: dejar un documento por _id
+        latest: Dict[str, bytes] = {}
+        copies: Dict[str, int] = {}
+        for product_id, raw in documents:
+            latest.pop(product_id, None)
+            latest[product_id] = raw
+            copies[product_id] = copies.get(product_id, 0) + 1
+        product_ids = list(latest)
+        operations = [
+            ReplaceOne({"_id": product_id}, RawBSONDocument(raw), upsert=True)
+            for product_id, raw in latest.items()
+        ]
+        
+        errors = 0
+        try:
+            self.get_collection(collection_name).bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            for error in write_errors[:5]:
+                logger.error(f"❌ Error saving product {product_ids[error['index']]}: {error.get('errmsg')}")
+            errors = sum(copies[product_ids[error['index']]] for error in write_errors)
+        return {"inserted": len(documents) - errors, "updated": 0, "errors": errors}
+    
     def close_connection(self):
         """Cerrar conexión con MongoDB"""
         if self.client:
             self.client.close()
             logger.info("🔌 MongoDB connection closed")
 
+def encode_product_docs(productos: List[Dict[str, Any]]) -> Tuple[List[Tuple[str, bytes]], List[Tuple[str, str]]]:
+    """
+    Etapa de CPU de la carga: hash, normalización, documento y BSON
+
+    Se ejecuta en los procesos de UploadWorkerPool. Un producto que no se
+    puede construir no tumba el lote: se devuelve aparte para contarlo como
+    error, igual que en save_products_batch.
+
+    Returns:
+        ((_id, BSON) listos para MongoDBManager.write_encoded, (_id, error) de
+        los productos fallidos)
+    """
+    import bson
+    encoded = []
+    failed = []
+    for producto in productos:
+        try:
+            doc = MongoDBManager.build_product_doc(producto)
+            encoded.append((doc["_id"], bson.encode(doc)))
+        except Exception as e:
+            try:
+                product_id = f"{producto.get('fuente', 'unknown')}_{producto.get('contador_extraccion', '')}"
+            except Exception:
+                product_id = repr(producto)[:80]
+            failed.append((product_id, str(e)))
+    return encoded, failed
+
+class UploadWorkerPool:
+    """
+    Pool de procesos que prepara lotes listos para escribir
+    
+    Mantiene hasta 'depth' lotes en vuelo, de modo que mientras el hilo
+    principal escribe un lote los workers ya preparan los siguientes.
+    """
+    
+    def __init__(self, workers: int, depth: Optional[int] = None):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        self.workers = workers
+        self.depth = depth or workers * 2
+        # spawn: no heredar el MongoClient ni los hilos del proceso padre
+        self.executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    
+    def encode(self, chunks: Iterable[List[Dict[str, Any]]]) -> Iterator[Tuple[List[Dict[str, Any]], Tuple[List[Tuple[str, bytes]], List[Tuple[str, str]]]]]:
+        """Devolver (lote, resultado de encode_product_docs) en el mismo orden de los lotes"""
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, self.executor.submit(encode_product_docs, chunk)))
+            if len(pending) >= self.depth:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
+    
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+class SpoolDrainer(threading.Thread):
+    """
+    Hilo que reintenta la conexión y drena el spool cuando Atlas vuelve
+    """
+    
+    def __init__(self, uploader: 'ProductUploader', interval: float = 30.0, max_interval: float = 300.0):
+        super().__init__(daemon=True, name='SpoolDrainer')
+        self.uploader = uploader
+        self.interval = interval
+        self.max_interval = max_interval
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        wait = 0.0
+        while not self._stop_event.wait(wait):
+            try:
+                self.uploader.drain_spool()
+                if not self.uploader.spool.has_pending():
+                    return
+                wait = self.interval
+            except Exception as e:
+                # Backoff exponencial mientras Atlas siga caído
+                wait = min(self.max_interval, max(self.interval, wait * 2))
+                logger.info(f"⏳ Spool drain pending, retrying in {wait:.0f}s: {e}")
+    
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
 class ProductUploader:
     """
     Clase principal para cargar productos desde JSON a MongoDB
+    
+    Si MongoDB no está disponible los productos se guardan en un spool local
+    (ver upload_spool.py) y se reproducen en bloque cuando vuelve la conexión.
+    Cada producto se valida como ProductRecord (los inválidos van a
+    cuarentena) y antes de escribir se descartan los duplicados (ver
+    product_dedup.py).
+    Con workers > 0 la preparación de documentos corre en un pool de procesos
+    en paralelo con la escritura.
     """
     
-    def __init__(self):
+    # Productos por lote al escribir; un lote fallido se envía completo al spool
+    WRITE_CHUNK_SIZE = 500
+    
+    def __init__(self, use_spool: Optional[bool] = None, dedup: Optional[bool] = None,
+                 workers: Optional[int] = None, validate: Optional[bool] = None):
         # Cargar variables de entorno
+        from dotenv import load_dotenv
+        from pymongo.errors import ConnectionFailure
         load_dotenv()
         
         self.connection_string = os.getenv('MONGODB_CONNECTION_STRING')
@@ -186,11 +417,163 @@ class ProductUploader:
         if not self.connection_string or not self.db_password:
             raise ValueError("❌ MongoDB connection string and password must be set in .env file")
         
-        self.mongo_manager = MongoDBManager(
-            self.connection_string, 
-            self.db_password,
-            self.database_name
-        )
+        if use_spool is None:
+            use_spool = os.getenv('UPLOAD_SPOOL', '1') != '0'
+        self.spool = UploadSpool() if use_spool else None
+        
+        if dedup is None:
+            dedup = os.getenv('UPLOAD_DEDUP', '1') != '0'
+        self.dedup = dedup
+        self.dedup_window = int(os.getenv('UPLOAD_DEDUP_WINDOW', DEFAULT_WINDOW))
+        
+        if validate is None:
+            validate = os.getenv('UPLOAD_VALIDATE', '1') != '0'
+        self.validate = validate
+        self.quarantine_dir = os.getenv('UPLOAD_QUARANTINE_DIR', 'quarantine')
+        
+        if workers is None:
+            workers = int(os.getenv('UPLOAD_WORKERS', '0'))
+        self.workers = workers
+        self._pool: Optional[UploadWorkerPool] = None
+        
+        # Serializa escrituras directas y drenado para no reordenar versiones de un producto
+        self._write_lock = threading.RLock()
+        self._drainer: Optional[SpoolDrainer] = None
+        self.mongo_manager: Optional[MongoDBManager] = None
+        
+        try:
+            self._connect()
+        except ConnectionFailure as e:
+            if self.spool is None:
+                raise
+            logger.warning(f"⚠️ MongoDB unavailable, products will be spooled to '{self.spool.spool_dir}': {e}")
+        
+        if self.spool is not None and self.spool.has_pending():
+            self._start_drainer()
+    
+    def _connect(self) -> MongoDBManager:
+        """Conectar (o reconectar) con MongoDB"""
+        if self.mongo_manager is None:
+            self.mongo_manager = MongoDBManager(
+                self.connection_string, 
+                self.db_password,
+                self.database_name
+            )
+        return self.mongo_manager
+    
+    def _set_offline(self):
+        if self.mongo_manager is not None:
+            self.mongo_manager.close_connection()
+            self.mongo_manager = None
+    
+    def _start_drainer(self):
+        if self._drainer is None or not self._drainer.is_alive():
+            self._drainer = SpoolDrainer(self)
+            self._drainer.start()
+    
+    def drain_spool(self) -> Dict[str, int]:
+        """
+        Reproducir en bloque los productos pendientes del spool
+        
+        Raises:
+            ConnectionFailure: si MongoDB sigue sin estar disponible
+        """
+        from pymongo.errors import ConnectionFailure
+        if self.spool is None:
+            return {"segments": 0, "replayed": 0, "corrupt": 0, "errors": 0}
+        with self._write_lock:
+            manager = self._connect()
+            try:
+                return self.spool.drain(manager.save_products_bulk)
+            except ConnectionFailure:
+                self._set_offline()
+                raise
+    
+    def _validated(self, productos: Iterable[Any], stats: Dict[str, int]) -> Iterator[Any]:
+        """Convertir a ProductRecord y enviar los productos inválidos a cuarentena"""
+        quarantine = None
+        try:
+            for producto in productos:
+                try:
+                    yield to_record(producto)
+                except InvalidProductError as e:
+                    stats["invalid"] += 1
+                    if quarantine is None:
+                        os.makedirs(self.quarantine_dir, exist_ok=True)
+                        path = os.path.join(self.quarantine_dir, f"invalid_{datetime.now().strftime('%Y%m%d')}.jsonl")
+                        quarantine = open(path, 'a', encoding='utf-8')
+                    quarantine.write(json.dumps({
+                        "quarantined_at": datetime.now().isoformat(),
+                        "errors": e.errors,
+                        "producto": producto
+                    }, ensure_ascii=False, default=str) + '\n')
+        finally:
+            if quarantine is not None:
+                quarantine.close()
+                logger.warning(f"⚠️ {stats['invalid']} invalid products quarantined in '{quarantine.name}'")
+    
+    def _save(self, productos: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Escribir productos en MongoDB o, si no está disponible, en el spool
+        """
+        from pymongo.errors import ConnectionFailure
+        stats = {"inserted": 0, "updated": 0, "errors": 0, "spooled": 0,
+                 "invalid": 0, "duplicates": 0, "id_collisions": 0}
+        if self.validate:
+            productos = self._validated(productos, stats)
+        if self.dedup:
+            productos = dedup_products(productos, stats, window=self.dedup_window)
+        productos = iter(productos)
+        
+        with self._write_lock:
+            # Lo ya encolado debe llegar antes que lo nuevo; la reconexión
+            # la intenta el SpoolDrainer, no el camino de escritura
+            spool_first = False
+            if self.spool is not None and self.spool.has_pending():
+                if self.mongo_manager is None:
+                    spool_first = True
+                else:
+                    try:
+                        self.drain_spool()
+                    except ConnectionFailure:
+                        spool_first = True
+            
+            chunks = iter(lambda: list(islice(productos, self.WRITE_CHUNK_SIZE)), [])
+            if self.workers > 0:
+                if self._pool is None:
+                    self._pool = UploadWorkerPool(self.workers)
+                prepared = self._pool.encode(chunks)
+            else:
+                prepared = ((chunk, None) for chunk in chunks)
+            
+            for chunk, encoded in prepared:
+                if self.mongo_manager is not None and not spool_first:
+                    try:
+                        if encoded is None:
+                            chunk_stats = self.mongo_manager.save_products_batch(chunk, self.collection_name)
+                        else:
+                            documents, failed = encoded
+                            chunk_stats = self.mongo_manager.write_encoded(documents, self.collection_name)
+                            for product_id, error in failed:
+                                logger.error(f"❌ Error saving product {product_id}: {error}")
+                            chunk_stats["errors"] += len(failed)
+                        for key, value in chunk_stats.items():
+                            stats[key] += value
+                        continue
+                    except ConnectionFailure as e:
+                        if self.spool is None:
+                            raise
+                        logger.warning(f"⚠️ Lost MongoDB connection, spooling remaining products: {e}")
+                        self._set_offline()
+                
+                if self.spool is None:
+                    raise ConnectionFailure("MongoDB unavailable and spool disabled")
+                stats["spooled"] += self.spool.append([as_dict(p) for p in chunk], self.collection_name)
+        
+        if stats["spooled"]:
+            logger.info(f"💾 {stats['spooled']} products spooled to '{self.spool.spool_dir}'")
+            self._start_drainer()
+        return stats
     
     def load_json_file(self, file_path: str) -> List[Dict[str, Any]]:
         """
@@ -227,9 +610,25 @@ class ProductUploader:
         logger.info(f"📊 Found {len(productos)} products to upload")
         
         # Subir productos a MongoDB
-        stats = self.mongo_manager.save_products_batch(productos, self.collection_name)
+        stats = self._save(productos)
+        
+        logger.info(f"📈 Upload completed - Inserted: {stats['inserted']}, Updated: {stats['updated']}, Errors: {stats['errors']}, Spooled: {stats['spooled']}, Duplicates: {stats['duplicates']}")
+        
+        return stats
+    
+    def upload_from_files(self, file_paths: List[str]) -> Dict[str, int]:
+        """
+        Subir varios archivos (p.ej. shards de un mismo crawl) como una sola
+        carga, leyéndolos en streaming y deduplicando entre archivos
+        """
+        def productos():
+            for file_path in file_paths:
+                logger.info(f"📂 Loading products from: {file_path}")
+                yield from iter_json_file(file_path)
+        
+        stats = self._save(productos())
         
-        logger.info(f"📈 Upload completed - Inserted: {stats['inserted']}, Updated: {stats['updated']}, Errors: {stats['errors']}")
+        logger.info(f"📈 Upload completed ({len(file_paths)} files) - Inserted: {stats['inserted']}, Updated: {stats['updated']}, Errors: {stats['errors']}, Spooled: {stats['spooled']}, Duplicates: {stats['duplicates']}")
         
         return stats
     
@@ -252,9 +651,9 @@ class ProductUploader:
             logger.info(f"📊 Found {len(productos)} products to upload from JSON string")
             
             # Subir productos a MongoDB
-            stats = self.mongo_manager.save_products_batch(productos, self.collection_name)
+            stats = self._save(productos)
             
-            logger.info(f"📈 Upload completed - Inserted: {stats['inserted']}, Updated: {stats['updated']}, Errors: {stats['errors']}")
+            logger.info(f"📈 Upload completed - Inserted: {stats['inserted']}, Updated: {stats['updated']}, Errors: {stats['errors']}, Spooled: {stats['spooled']}, Duplicates: {stats['duplicates']}")
             
             return stats
             
@@ -263,8 +662,21 @@ class ProductUploader:
             raise
     
     def close(self):
-        """Cerrar conexiones"""
-        self.mongo_manager.close_connection()
+        """Cerrar conexiones (intenta un último drenado del spool)"""
+        from pymongo.errors import ConnectionFailure
+        if self._drainer is not None and self._drainer.is_alive():
+            self._drainer.stop()
+        if self.spool is not None:
+            if self.mongo_manager is not None and self.spool.has_pending():
+                try:
+                    self.drain_spool()
+                except ConnectionFailure as e:
+                    logger.warning(f"⚠️ Spool kept for next run: {e}")
+            self.spool.close()
+        if self._pool is not None:
+            self._pool.close()
+        if self.mongo_manager is not None:
+            self.mongo_manager.close_connection()
 
 def main():
     """
@@ -280,14 +692,17 @@ def main():
     )
     
     parser = argparse.ArgumentParser(description='Upload products from JSON to MongoDB')
-    parser.add_argument('--file', '-f', type=str, help='JSON file path to upload')
+    parser.add_argument('--file', '-f', type=str, nargs='+', help='JSON file path(s) to upload; several files are deduplicated together')
     parser.add_argument('--json', '-j', type=str, help='JSON string to upload')
+    parser.add_argument('--drain-spool', action='store_true', help='Replay spooled products into MongoDB')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processes that build and BSON-encode documents in parallel with writes (0 = in-process)')
     
     args = parser.parse_args()
     
-    if not args.file and not args.json:
-        print("❌ Error: Please provide either --file or --json parameter")
-        logger.error("Please provide either --file or --json parameter")
+    if not args.file and not args.json and not args.drain_spool:
+        print("❌ Error: Please provide either --file, --json or --drain-spool parameter")
+        logger.error("Please provide either --file, --json or --drain-spool parameter")
         return
     
     uploader = None
@@ -295,26 +710,63 @@ def main():
     
     try:
         print("📡 Initializing connection to MongoDB...")
-        uploader = ProductUploader()
-        print("✅ Connection established successfully")
+        uploader = ProductUploader(workers=args.workers)
+        if uploader.mongo_manager is not None:
+            print("✅ Connection established successfully")
+        else:
+            print("⚠️ MongoDB unavailable - products will be spooled locally")
+        
+        if args.drain_spool:
+            print("📤 Draining upload spool...")
+            drain_stats = uploader.drain_spool()
+            print(f"   📊 Products replayed: {drain_stats['replayed']} from {drain_stats['segments']} segments")
+            if drain_stats['errors']:
+                print(f"   ❌ Products that failed to write: {drain_stats['errors']} (kept in failed_* spool segments)")
+                return 1
+            return 0
         
         if args.file:
-            print(f"📂 Processing file: {args.file}")
-            stats = uploader.upload_from_file(args.file)
+            if len(args.file) == 1:
+                print(f"📂 Processing file: {args.file[0]}")
+                stats = uploader.upload_from_file(args.file[0])
+            else:
+                print(f"📂 Processing {len(args.file)} files")
+                stats = uploader.upload_from_files(args.file)
         elif args.json:
             print("📝 Processing JSON string...")
             stats = uploader.upload_from_json_string(args.json)
         
+        # Sin escrituras y con productos en el spool: MongoDB no estuvo disponible
+        written = stats['inserted'] + stats['updated']
+        spooled_only = stats.get('spooled', 0) > 0 and written == 0
+        
         print("\n" + "="*50)
-        print("🎉 UPLOAD COMPLETED SUCCESSFULLY")
+        if spooled_only:
+            print("💾 UPLOAD SPOOLED - NOTHING WRITTEN TO MONGODB")
+        else:
+            print("🎉 UPLOAD COMPLETED SUCCESSFULLY")
         print("="*50)
         print(f"   📊 Products Inserted: {stats['inserted']}")
         print(f"   🔄 Products Updated:  {stats['updated']}")
         print(f"   ❌ Errors:           {stats['errors']}")
+        if stats.get('spooled'):
+            print(f"   💾 Spooled:          {stats['spooled']}")
+        if stats.get('invalid'):
+            print(f"   🚫 Invalid (quarantined): {stats['invalid']}")
+        if stats.get('duplicates'):
+            print(f"   🧹 Duplicates dropped: {stats['duplicates']}")
+        if stats.get('id_collisions'):
+            print(f"   ⚠️  _id collisions:    {stats['id_collisions']}")
         print("="*50)
         
-        if stats['errors'] > 0:
+        if spooled_only:
+            print(f"⚠️  MongoDB was unavailable: {stats['spooled']} products are waiting in the spool. "
+                  f"They will be written on the next run or with --drain-spool.")
+        elif stats['errors'] > 0:
             print("⚠️  Some errors occurred during upload. Check logs above for details.")
+        elif stats.get('spooled'):
+            print(f"⚠️  {stats['spooled']} products were spooled after losing the MongoDB connection. "
+                  f"They will be written on the next run or with --drain-spool.")
         else:
             print("✅ All products processed successfully!")
         
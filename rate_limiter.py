@@ -0,0 +1,194 @@
+"""
+Limitador de tasa por dominio compartido entre procesos
+
+Cada dominio de retailer tiene un token bucket cuyo estado vive en un archivo
+dentro de un directorio compartido (ARRYN_RATELIMIT_DIR). Los procesos hijos
+lanzados por el orchestrator coordinan el acceso con flock, de modo que el
+límite se respeta aunque varios scrapers corran en paralelo.
+
+La tasa se ajusta de forma adaptativa (AIMD): ante 429/5xx se reduce a la
+mitad y se bloquea el dominio durante Retry-After (en segundos o como fecha
+HTTP); con respuestas exitosas crece gradualmente hasta el máximo configurado.
+
+El límite solo aplica a las peticiones que pasan por el limitador, es decir,
+a los scrapers que usan http_session.get_session(). El orchestrator exporta
+ARRYN_RATELIMIT_DIR a todos los hijos, pero un scraper que sigue llamando a
+requests.get directamente no queda limitado.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import logging
+
+logger = logging.getLogger(__name__)
+
+RATELIMIT_DIR_ENV_VAR = 'ARRYN_RATELIMIT_DIR'
+RATE_LIMITS_ENV_VAR = 'ARRYN_RATE_LIMITS'
+
+# Peticiones por segundo máximas por dominio (ajustables con ARRYN_RATE_LIMITS)
+DEFAULT_LIMITS = {
+    'alkosto.com': 2.0,
+    'exito.com': 2.0,
+    'falabella.com.co': 1.0,
+}
+DEFAULT_RATE = 1.0
+MIN_RATE = 0.1
+BURST = 3.0
+INCREASE_STEP = 0.05
+BACKOFF_STATUS = {429, 500, 502, 503, 504}
+
+
+def parse_limits(spec: Optional[str]) -> Dict[str, float]:
+    """Parsear 'dominio=tasa,dominio=tasa' en un diccionario"""
+    limits = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        domain, rate = item.split('=', 1)
+        try:
+            limits[domain.strip().lower()] = float(rate)
+        except ValueError:
+            logger.warning(f"⚠️ Invalid rate limit entry: {item}")
+    return limits
+
+
+def normalize_domain(url_or_host: str) -> str:
+    """Obtener el dominio base ('https://www.exito.com/x' -> 'exito.com')"""
+    host = urlparse(url_or_host).hostname if '//' in url_or_host else url_or_host
+    host = (host or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class DomainRateLimiter:
+    """
+    Token bucket por dominio con estado en disco y bloqueo entre procesos
+    """
+
+    def __init__(self, state_dir: Optional[str] = None, limits: Optional[Dict[str, float]] = None,
+                 burst: float = BURST):
+        state_dir = state_dir or os.getenv(RATELIMIT_DIR_ENV_VAR) or os.path.join(
+            tempfile.gettempdir(), 'arryn_ratelimit'
+        )
+        self.state_dir = Path(state_dir)
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(parse_limits(os.getenv(RATE_LIMITS_ENV_VAR)))
+        if limits:
+            self.limits.update(limits)
+        self.burst = burst
+
+    def max_rate(self, domain: str) -> float:
+        """Tasa máxima configurada para el dominio (coincide por sufijo)"""
+        for configured, rate in self.limits.items():
+            if domain == configured or domain.endswith('.' + configured):
+                return rate
+        return DEFAULT_RATE
+
+    def _update(self, domain: str, fn) -> float:
+        """Leer, modificar y guardar el estado del dominio bajo flock"""
+        path = self.state_dir / f"{domain or 'default'}.json"
+        with open(path, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                now = time.time()
+                max_rate = self.max_rate(domain)
+                try:
+                    state = json.loads(raw) if raw else {}
+                except json.JSONDecodeError:
+                    state = {}
+                state.setdefault('rate', max_rate)
+                state.setdefault('tokens', self.burst)
+                state.setdefault('last', now)
+                state.setdefault('blocked_until', 0.0)
+
+                # Rellenar tokens según el tiempo transcurrido
+                elapsed = max(0.0, now - state['last'])
+                state['tokens'] = min(self.burst, state['tokens'] + elapsed * state['rate'])
+                state['last'] = now
+
+                result = fn(state, now, max_rate)
+
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def acquire(self, url_or_domain: str) -> float:
+        """
+        Esperar hasta obtener un token para el dominio
+
+        Returns:
+            Segundos totales de espera
+        """
+        domain = normalize_domain(url_or_domain)
+
+        def take(state, now, max_rate):
+            if now < state['blocked_until']:
+                return state['blocked_until'] - now
+            if state['tokens'] >= 1.0:
+                state['tokens'] -= 1.0
+                return 0.0
+            return (1.0 - state['tokens']) / state['rate']
+
+        waited = 0.0
+        while True:
+            wait = self._update(domain, take)
+            if wait <= 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def report(self, url_or_domain: str, status_code: int, retry_after: Optional[str] = None):
+        """Ajustar la tasa del dominio según el código de respuesta"""
+        domain = normalize_domain(url_or_domain)
+
+        def adjust(state, now, max_rate):
+            if status_code in BACKOFF_STATUS:
+                state['rate'] = max(MIN_RATE, state['rate'] / 2)
+                state['tokens'] = 0.0
+                delay = _parse_retry_after(retry_after, now)
+                if delay is None:
+                    delay = 1.0 / state['rate']
+                state['blocked_until'] = max(state['blocked_until'], now + delay)
+                logger.warning(
+                    f"⚠️ {domain} responded {status_code}; rate -> {state['rate']:.2f} req/s, "
+                    f"pausing {delay:.1f}s"
+                )
+            elif status_code < 400:
+                state['rate'] = min(max_rate, state['rate'] + INCREASE_STEP * max_rate)
+            return state['rate']
+
+        return self._update(domain, adjust)
+
+
+def _parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """
+    Interpretar Retry-After: segundos ('120') o fecha HTTP
+    ('Wed, 21 Oct 2015 07:28:00 GMT'). Devuelve los segundos de espera
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value.strip())
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at.tzinfo is None:
+        return None
+    return max(0.0, retry_at.timestamp() - (time.time() if now is None else now))
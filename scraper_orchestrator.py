@@ -4,46 +4,93 @@ Orchestrator corregido para manejar imports relativos de scrapers
 """
 
 import subprocess
+import fcntl
+import hashlib
 import json
 import logging
 import os
+import shutil
 import sys
+import time
+import uuid
 from pathlib import Path
 from typing import Dict, List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from json_stream import iter_json_file
+from browser_pool import BrowserPool
+from crawl_queue import CrawlQueue, LeaseHeartbeat, default_worker_id, expand_plan
+from http_cache import CACHE_DIR_ENV_VAR, CACHE_MODE_ENV_VAR, CACHE_MODES
+from rate_limiter import RATELIMIT_DIR_ENV_VAR
+
+# Campos mínimos que debe traer un producto para considerarse válido en el
+# reporte de calidad (el uploader solo rechaza lo que no puede escribir, ver
+# product_record.ProductRecord)
+PRODUCT_REQUIRED_FIELDS = ('titulo', 'precio_valor', 'fuente', 'link')
+
+# Contrato de salida: el orchestrator le indica a cada scraper dónde escribir
+OUTPUT_ENV_VAR = 'ARRYN_OUTPUT_FILE'
+RUN_ID_ENV_VAR = 'ARRYN_RUN_ID'
+# Registros de ejecuciones activas más viejos que esto se consideran huérfanos
+ACTIVE_RUN_STALE_SECONDS = 1800
 
 class ScraperOrchestrator:
-    def __init__(self):
+    def __init__(self, http_cache: Optional[str] = None, browser_pool_size: Optional[int] = None):
         self.base_dir = Path(__file__).parent
         self.scrapers_dir = self.base_dir / 'scrapers'
         self.output_dir = self.base_dir / 'scraped_output'
+        self.runs_dir = self.output_dir / 'runs'
+        self.ratelimit_dir = self.output_dir / '.ratelimit'
+        self.http_cache_dir = self.output_dir / '.http_cache'
         self.logs_dir = self.base_dir / 'logs'
         
         # Crear directorios si no existen
         self.output_dir.mkdir(exist_ok=True)
+        self.runs_dir.mkdir(exist_ok=True)
+        self.ratelimit_dir.mkdir(exist_ok=True)
         self.logs_dir.mkdir(exist_ok=True)
         
+        # Política de retención de salidas por ejecución
+        self.retention_days = int(os.getenv('OUTPUT_RETENTION_DAYS', '30'))
+        self.max_runs_per_scraper = int(os.getenv('OUTPUT_MAX_RUNS', '20'))
+        
+        # Caché HTTP para los scrapers: off, on u offline (reproducción sin red)
+        self.http_cache = (http_cache or os.getenv(CACHE_MODE_ENV_VAR, 'off')).lower()
+        if self.http_cache not in CACHE_MODES:
+            raise ValueError(f"Modo de caché inválido: {self.http_cache}. Disponibles: {list(CACHE_MODES)}")
+        
+        # Pool de navegadores calientes para scrapers con 'browser': True (0 = desactivado)
+        if browser_pool_size is None:
+            browser_pool_size = int(os.getenv('ARRYN_BROWSER_POOL_SIZE', '0'))
+        self.browser_pool_size = browser_pool_size
+        self.browser_pool: Optional[BrowserPool] = None
+        
         self.logger = self._setup_logging()
         
+        # Categoría por defecto cuando no se usa el planificador
+        self.default_categoria = 'televisores'
+        
         # Mapeo específico de comandos por scraper
+        # Placeholders disponibles en args_template: {categoria}, {paginas}, {output}
         self.scraper_commands = {
             'alkosto': {
                 'method': 'module',
                 'cwd': 'scrapers/alkosto',
                 'command': ['python', '-m', 'alkosto_scraper.main', 'scrape'],
-                'args_template': ['--categoria', 'televisores', '--paginas', '{paginas}']
+                'args_template': ['--categoria', '{categoria}', '--paginas', '{paginas}']
             },
             'exito': {
                 'method': 'module', 
                 'cwd': 'scrapers/exito',
                 'command': ['python', '-m', 'exito_scraper.main', 'scrape'],
-                'args_template': ['--categoria', 'televisores', '--paginas', '{paginas}']
+                'args_template': ['--categoria', '{categoria}', '--paginas', '{paginas}']
             },
             'falabella': {
                 'method': 'script',
+                'browser': True,
                 'cwd': 'scrapers/falabella',
                 'command': ['python', 'scrape_falabella_all.py'],
-                'args_template': ['--category', 'televisores', '--pages', '{paginas}']
+                'args_template': ['--category', '{categoria}', '--pages', '{paginas}']
             }
         }
         
@@ -77,13 +124,14 @@ class ScraperOrchestrator:
         
         return logger
         
-    def ejecutar_scraper(self, scraper_name: str, paginas: int = 1) -> Dict:
+    def ejecutar_scraper(self, scraper_name: str, paginas: int = 1, categoria: Optional[str] = None) -> Dict:
         """
         Ejecuta un scraper específico con el método correcto
         
         Args:
             scraper_name: 'alkosto', 'exito', 'falabella'
-            paginas: Número de páginas a scraper
+            paginas: Número de páginas a scraper (hasta esta página)
+            categoria: Categoría a scrapear (default: televisores)
             
         Returns:
             Dict con resultado de la ejecución
@@ -102,35 +150,48 @@ class ScraperOrchestrator:
             return {"success": False, "error": error_msg, "output_file": None}
             
         try:
-            self.logger.info(f"Ejecutando {scraper_name} con {paginas} páginas...")
+            categoria = categoria or self.default_categoria
+            self.logger.info(f"Ejecutando {scraper_name} ({categoria}) con {paginas} páginas...")
+            
+            # Ruta única de salida para esta ejecución
+            run_id, output_path = self._nueva_ruta_salida(scraper_name)
             
             # Construir comando completo
             cmd = config['command'].copy()
             
             # Agregar argumentos específicos del scraper
             for arg in config['args_template']:
-                if '{paginas}' in arg:
-                    cmd.append(arg.format(paginas=paginas))
-                else:
-                    cmd.append(arg)
+                cmd.append(arg.format(paginas=paginas, categoria=categoria, output=output_path))
+            
+            # El scraper recibe la ruta de salida y los servicios compartidos por entorno
+            env = self._child_env(run_id, output_path, browser=config.get('browser', False))
             
             self.logger.info(f"Comando: {' '.join(cmd)}")
             self.logger.info(f"Directorio de trabajo: {scraper_dir}")
+            self.logger.info(f"Salida esperada: {output_path}")
             
-            # Ejecutar comando
-            result = subprocess.run(
-                cmd,
-                cwd=scraper_dir,
-                capture_output=True,
-                text=True,
-                timeout=600  # 10 minutos timeout
-            )
+            inicio = datetime.now().timestamp()
+            
+            # Ejecutar comando, registrado como activo para detectar ejecuciones concurrentes
+            self._registrar_ejecucion(scraper_name, run_id)
+            try:
+                result = subprocess.run(
+                    cmd,
+                    cwd=scraper_dir,
+                    env=env,
+                    capture_output=True,
+                    text=True,
+                    timeout=600  # 10 minutos timeout
+                )
+            finally:
+                concurrente = self._finalizar_ejecucion(scraper_name, run_id)
             
             if result.returncode == 0:
                 self.logger.info(f"✅ {scraper_name} ejecutado exitosamente")
                 
-                # Buscar archivo de salida generado
-                output_file = self._find_output_file(scraper_dir, scraper_name)
+                # Leer la salida desde la ruta acordada
+                output_file = self._resolve_output_file(output_path, scraper_dir, scraper_name, inicio,
+                                                        concurrente)
                 
                 return {
                     "success": True,
@@ -161,8 +222,144 @@ class ScraperOrchestrator:
             self.logger.error(error_msg)
             return {"success": False, "error": error_msg, "output_file": None}
     
-    def _find_output_file(self, scraper_dir: Path, scraper_name: str) -> Optional[str]:
-        """Buscar archivo de salida más reciente del scraper"""
+    def _child_env(self, run_id: str, output_path: Path, browser: bool = False) -> Dict[str, str]:
+        """Variables de entorno para un proceso scraper hijo"""
+        env = os.environ.copy()
+        env[OUTPUT_ENV_VAR] = str(output_path)
+        env[RUN_ID_ENV_VAR] = run_id
+        
+        # Limitador de tasa compartido (efectivo en los scrapers que usan http_session)
+        env[RATELIMIT_DIR_ENV_VAR] = str(self.ratelimit_dir)
+        
+        # Caché de respuestas HTTP (http_session la usa si está activa)
+        env[CACHE_MODE_ENV_VAR] = self.http_cache
+        env.setdefault(CACHE_DIR_ENV_VAR, str(self.http_cache_dir))
+        
+        # Endpoints del pool de navegadores (browser_pool.connect_playwright)
+        if browser and self.browser_pool is not None:
+            env.update(self.browser_pool.env())
+        
+        # Permitir que los scrapers importen helpers compartidos (http_session, ...)
+        pythonpath = env.get('PYTHONPATH')
+        env['PYTHONPATH'] = os.pathsep.join(p for p in (str(self.base_dir), pythonpath) if p)
+        return env
+    
+    def _start_browser_pool(self, scrapers: List[str]):
+        """Arrancar el pool de navegadores si algún scraper lo necesita"""
+        if self.browser_pool_size <= 0 or self.browser_pool is not None:
+            return
+        if not any(self.scraper_commands.get(s, {}).get('browser') for s in scrapers):
+            return
+        
+        pool = BrowserPool(
+            size=self.browser_pool_size,
+            max_pages=int(os.getenv('ARRYN_BROWSER_MAX_PAGES', '4')),
+            max_rss_mb=float(os.getenv('ARRYN_BROWSER_MAX_RSS_MB', '1024'))
+        )
+        try:
+            pool.start()
+            self.browser_pool = pool
+        except Exception as e:
+            pool.stop()
+            self.logger.warning(f"⚠️ No se pudo iniciar el pool de navegadores, cada scraper lanzará el suyo: {e}")
+    
+    def _stop_browser_pool(self):
+        if self.browser_pool is not None:
+            self.browser_pool.stop()
+            self.browser_pool = None
+    
+    def _nueva_ruta_salida(self, scraper_name: str) -> tuple:
+        """Generar run_id y ruta de salida única para una ejecución"""
+        run_id = f"{scraper_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        return run_id, self.runs_dir / f"{run_id}.json"
+    
+    def _actualizar_ejecuciones_activas(self, scraper_name: str, fn):
+        """Leer, modificar y guardar bajo flock el registro de ejecuciones activas de un scraper"""
+        path = self.runs_dir / f".active_{scraper_name}.json"
+        with open(path, 'a+', encoding='utf-8') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    activas = json.loads(raw) if raw else {}
+                except json.JSONDecodeError:
+                    activas = {}
+                
+                # Descartar registros de procesos que murieron sin finalizar
+                limite = time.time() - ACTIVE_RUN_STALE_SECONDS
+                activas = {k: v for k, v in activas.items() if v.get('inicio', 0) >= limite}
+                
+                result = fn(activas)
+                
+                f.seek(0)
+                f.truncate()
+                json.dump(activas, f)
+                f.flush()
+                return result
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def _registrar_ejecucion(self, scraper_name: str, run_id: str):
+        """
+        Marcar una ejecución como activa
+        
+        Si ya hay otras ejecuciones del mismo scraper, todas (incluida esta) quedan
+        marcadas como concurrentes y ninguna podrá reclamar una salida legada.
+        """
+        def registrar(activas):
+            concurrente = bool(activas)
+            for entrada in activas.values():
+                entrada['concurrente'] = True
+            activas[run_id] = {'inicio': time.time(), 'concurrente': concurrente}
+        
+        self._actualizar_ejecuciones_activas(scraper_name, registrar)
+    
+    def _finalizar_ejecucion(self, scraper_name: str, run_id: str) -> bool:
+        """Quitar la ejecución del registro; True si se solapó con otra"""
+        def finalizar(activas):
+            entrada = activas.pop(run_id, None)
+            # Sin registro (p. ej. descartado por viejo) no se puede descartar solapamiento
+            return True if entrada is None else bool(entrada.get('concurrente') or activas)
+        
+        return self._actualizar_ejecuciones_activas(scraper_name, finalizar)
+    
+    def _resolve_output_file(self, output_path: Path, scraper_dir: Path, scraper_name: str,
+                             desde: float, concurrente: bool = False) -> Optional[str]:
+        """
+        Obtener el archivo de salida de una ejecución
+        
+        Los scrapers que respetan el contrato escriben en output_path. Para los que
+        aún no lo hacen se acepta un archivo legado, solo si fue modificado durante
+        esta ejecución y ninguna otra ejecución del mismo scraper estuvo activa a la
+        vez (el archivo podría ser de esa otra ejecución). El archivo se mueve a
+        output_path para que quede bajo la retención.
+        """
+        if output_path.exists() and output_path.stat().st_size > 0:
+            self.logger.info(f"Archivo de salida encontrado: {output_path}")
+            return str(output_path)
+        
+        legacy_file = self._find_legacy_output_file(scraper_dir, scraper_name, desde)
+        if legacy_file is None:
+            self.logger.warning(f"No se encontró archivo de salida para {scraper_name}")
+            return None
+        
+        if concurrente:
+            self.logger.error(
+                f"❌ {scraper_name} no escribió en {OUTPUT_ENV_VAR} y otra ejecución del mismo "
+                f"scraper estuvo activa a la vez; no se puede saber de quién es {legacy_file}"
+            )
+            return None
+        
+        self.logger.warning(
+            f"⚠️ {scraper_name} no escribió en {OUTPUT_ENV_VAR}; usando salida legada {legacy_file}"
+        )
+        shutil.move(str(legacy_file), str(output_path))
+        return str(output_path)
+    
+    def _find_legacy_output_file(self, scraper_dir: Path, scraper_name: str,
+                                 desde: float) -> Optional[Path]:
+        """Buscar salida legada del scraper generada después de 'desde'"""
         possible_patterns = [
             f"productos*.json",
             f"products*.json", 
@@ -173,17 +370,48 @@ class ScraperOrchestrator:
         
         output_files = []
         for pattern in possible_patterns:
-            files = list(scraper_dir.glob(pattern))
-            output_files.extend(files)
+            for f in scraper_dir.glob(pattern):
+                # Ignorar archivos de ejecuciones anteriores o ajenas
+                if f.stat().st_mtime >= desde:
+                    output_files.append(f)
         
         if output_files:
-            # Retornar el más reciente
-            latest_file = max(output_files, key=lambda f: f.stat().st_mtime)
-            self.logger.info(f"Archivo de salida encontrado: {latest_file}")
-            return str(latest_file)
-        else:
-            self.logger.warning(f"No se encontró archivo de salida para {scraper_name}")
-            return None
+            return max(output_files, key=lambda f: f.stat().st_mtime)
+        return None
+    
+    def _limpiar_salidas_antiguas(self) -> int:
+        """
+        Aplicar la política de retención sobre scraped_output/runs
+        
+        Elimina salidas con más de retention_days días y conserva como máximo
+        max_runs_per_scraper archivos por scraper.
+        
+        Returns:
+            Número de archivos eliminados
+        """
+        limite = datetime.now() - timedelta(days=self.retention_days)
+        por_scraper: Dict[str, List[Path]] = {}
+        eliminados = 0
+        
+        for f in self.runs_dir.glob('*.json'):
+            if f.name.startswith('.'):
+                continue  # registros de ejecuciones activas
+            if datetime.fromtimestamp(f.stat().st_mtime) < limite:
+                f.unlink(missing_ok=True)
+                eliminados += 1
+                continue
+            scraper_name = f.name.split('_', 1)[0]
+            por_scraper.setdefault(scraper_name, []).append(f)
+        
+        for archivos in por_scraper.values():
+            archivos.sort(key=lambda f: f.stat().st_mtime, reverse=True)
+            for f in archivos[self.max_runs_per_scraper:]:
+                f.unlink(missing_ok=True)
+                eliminados += 1
+        
+        if eliminados:
+            self.logger.info(f"🧹 Retención: {eliminados} salidas antiguas eliminadas")
+        return eliminados
     
     def ejecutar_multiple(self, scrapers: List[str], paginas: int = 1) -> Dict:
         """
@@ -203,29 +431,54 @@ class ScraperOrchestrator:
         archivos_generados = []
         errores = []
         productos_totales = 0
+        calidad_datos = {}
         
-        for scraper in scrapers:
-            self.logger.info(f"Ejecutando {scraper} con {paginas} páginas")
-            
-            resultado = self.ejecutar_scraper(scraper, paginas)
-            resultados[scraper] = resultado
-            
-            if resultado["success"]:
-                if resultado["output_file"]:
-                    archivos_generados.append(resultado["output_file"])
-                    
-                    # Contar productos en el archivo
+        self._start_browser_pool(scrapers)
+        try:
+            for scraper in scrapers:
+                self.logger.info(f"Ejecutando {scraper} con {paginas} páginas")
+                
+                resultado = self.ejecutar_scraper(scraper, paginas)
+                resultados[scraper] = resultado
+                
+                # Reciclar navegadores que crecieron demasiado entre ejecuciones
+                if self.browser_pool is not None and self.scraper_commands.get(scraper, {}).get('browser'):
                     try:
-                        productos_count = self._count_products(resultado["output_file"])
-                        productos_totales += productos_count
-                        self.logger.info(f"✅ {scraper}: {productos_count} productos extraídos")
+                        self.browser_pool.recycle()
                     except Exception as e:
-                        self.logger.warning(f"No se pudo contar productos de {scraper}: {e}")
+                        self.logger.warning(f"No se pudo reciclar el pool de navegadores: {e}")
+                        self._stop_browser_pool()
+                
+                if resultado["success"]:
+                    if resultado["output_file"]:
+                        archivos_generados.append(resultado["output_file"])
+                    
+                        # Contar y validar productos en el archivo (una sola lectura)
+                        try:
+                            calidad = self._analyze_products(resultado["output_file"])
+                            calidad_datos[scraper] = calidad
+                            if not calidad["completo"]:
+                                # No reportar conteos truncados como si fueran el total
+                                errores.append(f"Salida ilegible de {scraper}: {calidad['error']}")
+                                self.logger.error(f"❌ {scraper}: salida ilegible, conteos incompletos")
+                                continue
+                            productos_count = calidad["total"]
+                            productos_totales += productos_count
+                            self.logger.info(f"✅ {scraper}: {productos_count} productos extraídos")
+                            if calidad["invalidos"] or calidad["links_duplicados"]:
+                                self.logger.warning(
+                                    f"⚠️ {scraper}: {calidad['invalidos']} inválidos, "
+                                    f"{calidad['links_duplicados']} links duplicados"
+                                )
+                        except Exception as e:
+                            self.logger.warning(f"No se pudo contar productos de {scraper}: {e}")
+                    else:
+                        self.logger.warning(f"⚠️ {scraper}: ejecutado pero sin archivo de salida")
                 else:
-                    self.logger.warning(f"⚠️ {scraper}: ejecutado pero sin archivo de salida")
-            else:
-                errores.append(f"Falló scraper {scraper}")
-                self.logger.error(f"❌ {scraper}: {resultado['error']}")
+                    errores.append(f"Falló scraper {scraper}")
+                    self.logger.error(f"❌ {scraper}: {resultado['error']}")
+        finally:
+            self._stop_browser_pool()
         
         timestamp_fin = datetime.now()
         duracion = (timestamp_fin - timestamp_inicio).total_seconds()
@@ -238,12 +491,19 @@ class ScraperOrchestrator:
         self.logger.info(f"Productos procesados: {productos_totales}")
         self.logger.info(f"Errores: {len(errores)}")
         
+        # Aplicar retención de salidas
+        try:
+            self._limpiar_salidas_antiguas()
+        except Exception as e:
+            self.logger.warning(f"No se pudo aplicar la retención de salidas: {e}")
+        
         resumen = {
             "inicio": timestamp_inicio.isoformat(),
             "scrapers_ejecutados": scrapers_exitosos,
             "archivos_generados": archivos_generados,
             "errores": errores,
             "productos_procesados": productos_totales,
+            "calidad_datos": calidad_datos,
             "fin": timestamp_fin.isoformat()
         }
         
@@ -255,27 +515,281 @@ class ScraperOrchestrator:
         print(json.dumps(resumen, indent=2, ensure_ascii=False))
         return resumen
         
+    def _abrir_cola(self, cola: str = 'sqlite', queue_db: Optional[str] = None):
+        """
+        Abrir la cola de trabajo
+        
+        Args:
+            cola: 'sqlite' (local, un solo host) o 'mongo' (compartida entre nodos)
+            queue_db: Ruta de la base SQLite (solo para 'sqlite')
+        """
+        if cola == 'mongo':
+            # Import diferido: solo el modo distribuido necesita pymongo aquí
+            from mongo_job_queue import MongoJobQueue
+            return MongoJobQueue.from_env()
+        if cola == 'sqlite':
+            return CrawlQueue(queue_db or str(self.output_dir / 'crawl_queue.db'))
+        raise ValueError(f"Cola desconocida: {cola}. Disponibles: ['sqlite', 'mongo']")
+    
+    def ejecutar_plan(self, scrapers: List[str], categorias: List[str], paginas: int = 1,
+                      queue_db: Optional[str] = None, nuevo_plan: bool = False,
+                      cola: str = 'sqlite') -> Dict:
+        """
+        Ejecuta un plan de crawl (scraper × categoría) desde una cola persistente
+        
+        Las unidades se guardan en la cola, así que si el proceso se interrumpe una
+        nueva invocación con el mismo plan retoma solo las unidades pendientes. Si
+        el plan ya está terminado no se ejecuta nada y el resumen trae
+        'plan_completo'; nuevo_plan lo vuelve a ejecutar desde cero. Con
+        cola='mongo' otros nodos pueden sumarse con ejecutar_worker.
+        
+        Args:
+            scrapers: Lista de nombres de scrapers
+            categorias: Categorías a recorrer en cada scraper
+            paginas: Páginas por (scraper, categoría)
+            queue_db: Ruta de la base SQLite de la cola
+            nuevo_plan: Descartar unidades terminadas de crawls anteriores
+            cola: 'sqlite' o 'mongo'
+            
+        Returns:
+            Resumen de ejecución
+        """
+        queue = self._abrir_cola(cola, queue_db)
+        try:
+            if nuevo_plan:
+                self.logger.info(f"Plan nuevo: {queue.reset()} unidades anteriores descartadas")
+            
+            units = []
+            for scraper in scrapers:
+                if scraper not in self.scraper_commands:
+                    self.logger.error(f"Scraper '{scraper}' no configurado, se omite del plan")
+                    continue
+                units.extend(expand_plan([scraper], categorias, paginas))
+            
+            nuevas = queue.add_units(units)
+            self.logger.info(f"=== PLAN - {len(units)} unidades ({nuevas} nuevas) ===")
+            
+            estado_cola = queue.stats()
+            if not estado_cola.get('pending') and not estado_cola.get('leased'):
+                self.logger.info(
+                    f"✅ El plan ya está completo ({estado_cola}); nada que ejecutar. "
+                    f"Usa --nuevo-plan para volver a scrapear"
+                )
+                if estado_cola.get('failed'):
+                    self.logger.warning(f"⚠️ {estado_cola['failed']} unidades agotaron sus intentos")
+                return {
+                    "inicio": datetime.now().isoformat(),
+                    "plan_completo": True,
+                    "scrapers_ejecutados": 0,
+                    "unidades": estado_cola,
+                    "archivos_generados": [],
+                    "errores": [],
+                    "productos_procesados": 0
+                }
+            
+            return self._procesar_cola(queue, 'plan')
+        finally:
+            queue.close()
+    
+    def ejecutar_worker(self, cola: str = 'mongo', queue_db: Optional[str] = None,
+                        espera: float = 0) -> Dict:
+        """
+        Modo worker: procesar trabajos ya planificados por otro nodo
+        
+        Args:
+            cola: 'mongo' (compartida) o 'sqlite'
+            queue_db: Ruta de la base SQLite (solo para 'sqlite')
+            espera: Segundos a seguir esperando trabajo nuevo cuando la cola está vacía
+            
+        Returns:
+            Resumen de ejecución
+        """
+        queue = self._abrir_cola(cola, queue_db)
+        try:
+            return self._procesar_cola(queue, 'worker', espera)
+        finally:
+            queue.close()
+    
+    def _procesar_cola(self, queue, prefijo: str, espera: float = 0) -> Dict:
+        """Tomar y ejecutar unidades de la cola hasta vaciarla"""
+        timestamp_inicio = datetime.now()
+        worker_id = default_worker_id()
+        heartbeat_interval = max(1.0, queue.lease_seconds / 4)
+        
+        archivos_generados = []
+        errores = []
+        productos_totales = 0
+        calidad_datos = {}
+        unidades_exitosas = 0
+        
+        queue.release_dead_leases()
+        self.logger.info(f"=== INICIANDO {prefijo.upper()} ({worker_id}) - estado: {queue.stats()} ===")
+        
+        try:
+            ultimo_trabajo = time.time()
+            while True:
+                unit = queue.lease(worker_id)
+                if unit is None:
+                    if time.time() - ultimo_trabajo >= espera:
+                        break
+                    time.sleep(min(5.0, espera))
+                    continue
+                ultimo_trabajo = time.time()
+                
+                nombre = f"{unit['retailer']}/{unit['categoria']}/p{unit['page_start']}-{unit['page_end']}"
+                self.logger.info(f"Unidad {unit['id']} ({nombre}), intento {unit['attempts']}")
+                
+                config = self.scraper_commands.get(unit['retailer'], {})
+                if config.get('browser'):
+                    self._start_browser_pool([unit['retailer']])
+                
+                # Renovar el lease mientras el scraper corre
+                with LeaseHeartbeat(queue, unit['id'], worker_id, heartbeat_interval) as heartbeat:
+                    resultado = self.ejecutar_scraper(unit['retailer'], unit['page_end'], unit['categoria'])
+                if heartbeat.lost:
+                    self.logger.warning(f"⚠️ {nombre}: lease perdido, otro worker reintentará la unidad")
+                
+                if resultado["success"]:
+                    calidad = None
+                    if resultado["output_file"]:
+                        archivos_generados.append(resultado["output_file"])
+                        calidad = self._analyze_products(resultado["output_file"])
+                        calidad_datos[nombre] = calidad
+                    if calidad is not None and not calidad["completo"]:
+                        queue.fail(unit['id'], f"salida ilegible: {calidad['error']}", owner=worker_id)
+                        errores.append(f"Salida ilegible de {nombre}: {calidad['error']}")
+                        self.logger.error(f"❌ {nombre}: salida ilegible, conteos incompletos")
+                    else:
+                        if calidad is not None:
+                            productos_totales += calidad["total"]
+                            self.logger.info(f"✅ {nombre}: {calidad['total']} productos extraídos")
+                        queue.complete(unit['id'], resultado["output_file"], calidad, owner=worker_id)
+                        unidades_exitosas += 1
+                else:
+                    queue.fail(unit['id'], resultado.get("error") or "error desconocido", owner=worker_id)
+                    errores.append(f"Falló unidad {nombre}")
+                    self.logger.error(f"❌ {nombre}: {resultado['error']}")
+                
+                if self.browser_pool is not None and config.get('browser'):
+                    try:
+                        self.browser_pool.recycle()
+                    except Exception as e:
+                        self.logger.warning(f"No se pudo reciclar el pool de navegadores: {e}")
+                        self._stop_browser_pool()
+            
+            estado_cola = queue.stats()
+        finally:
+            self._stop_browser_pool()
+        
+        timestamp_fin = datetime.now()
+        
+        self.logger.info(f"=== {prefijo.upper()} COMPLETADO ===")
+        self.logger.info(f"Estado de la cola: {estado_cola}")
+        self.logger.info(f"Unidades exitosas: {unidades_exitosas}")
+        self.logger.info(f"Productos procesados: {productos_totales}")
+        
+        try:
+            self._limpiar_salidas_antiguas()
+        except Exception as e:
+            self.logger.warning(f"No se pudo aplicar la retención de salidas: {e}")
+        
+        resumen = {
+            "inicio": timestamp_inicio.isoformat(),
+            "worker": worker_id,
+            "scrapers_ejecutados": unidades_exitosas,
+            "unidades": estado_cola,
+            "archivos_generados": archivos_generados,
+            "errores": errores,
+            "productos_procesados": productos_totales,
+            "calidad_datos": calidad_datos,
+            "fin": timestamp_fin.isoformat()
+        }
+        
+        resumen_file = self.output_dir / f"{prefijo}_{timestamp_inicio.strftime('%Y%m%d_%H%M%S')}.json"
+        with open(resumen_file, 'w', encoding='utf-8') as f:
+            json.dump(resumen, f, indent=2, ensure_ascii=False)
+        
+        print(json.dumps(resumen, indent=2, ensure_ascii=False))
+        return resumen
+    
     def _count_products(self, file_path: str) -> int:
         """Contar productos en archivo JSON/JSONL"""
+        return self._analyze_products(file_path)["total"]
+    
+    def _analyze_products(self, file_path: str) -> Dict:
+        """
+        Contar, validar y perfilar productos de un archivo JSON/JSONL en una sola pasada
+        
+        El archivo se lee por bloques, por lo que la memoria no depende del tamaño
+        del archivo (salvo los resúmenes de links usados para detectar duplicados).
+        
+        Returns:
+            Dict con total, válidos, inválidos, conteo por extraction_status de
+            los válidos, productos sin precio, links duplicados y rango de precios. Si el
+            archivo no se puede leer hasta el final, 'completo' es False, 'error'
+            trae el motivo y los conteos solo cubren la parte leída
+        """
+        stats = {
+            "completo": True,
+            "error": None,
+            "total": 0,
+            "validos": 0,
+            "invalidos": 0,
+            "por_status": {},
+            "sin_precio": 0,
+            "links_duplicados": 0,
+            "precio_min": None,
+            "precio_max": None
+        }
+        links_vistos = set()
+        
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read().strip()
+            for producto in iter_json_file(file_path):
+                stats["total"] += 1
                 
-                if not content:
-                    return 0
-                    
-                # Detectar formato
-                if content.startswith('['):
-                    # JSON array
-                    data = json.loads(content)
-                    return len(data) if isinstance(data, list) else 1
+                if not isinstance(producto, dict) or any(k not in producto for k in PRODUCT_REQUIRED_FIELDS):
+                    stats["invalidos"] += 1
+                    continue
+                
+                precio = producto.get('precio_valor')
+                if isinstance(precio, bool) or not isinstance(precio, (int, float)):
+                    stats["invalidos"] += 1
+                    continue
+                
+                link = producto.get('link')
+                if link is not None and not isinstance(link, str):
+                    stats["invalidos"] += 1
+                    continue
+                stats["validos"] += 1
+                
+                # Solo los válidos, para que por_status sume lo mismo que 'validos'
+                status = str(producto.get('extraction_status') or 'SIN_STATUS')
+                stats["por_status"][status] = stats["por_status"].get(status, 0) + 1
+                
+                if precio <= 0:
+                    stats["sin_precio"] += 1
                 else:
-                    # JSONL - contar líneas
-                    return len([line for line in content.split('\n') if line.strip()])
+                    if stats["precio_min"] is None or precio < stats["precio_min"]:
+                        stats["precio_min"] = precio
+                    if stats["precio_max"] is None or precio > stats["precio_max"]:
+                        stats["precio_max"] = precio
+                
+                if link:
+                    # Guardar solo un resumen de 8 bytes por link
+                    link_key = hashlib.blake2b(link.encode('utf-8'), digest_size=8).digest()
+                    if link_key in links_vistos:
+                        stats["links_duplicados"] += 1
+                    else:
+                        links_vistos.add(link_key)
                     
         except Exception as e:
-            self.logger.warning(f"Error contando productos en {file_path}: {e}")
-            return 0
+            stats["completo"] = False
+            stats["error"] = str(e)
+            self.logger.warning(
+                f"Lectura incompleta de {file_path} tras {stats['total']} productos: {e}"
+            )
+        
+        return stats
 
 def main():
     """Función principal para ejecución desde CLI"""
@@ -289,6 +803,34 @@ def main():
                        type=int, 
                        default=1,
                        help='Número de páginas por scraper (default: 1)')
+    parser.add_argument('--categorias',
+                       default=None,
+                       help='Categorías a scrapear (separadas por coma). Activa el modo plan con cola persistente')
+    parser.add_argument('--queue-db',
+                       default=None,
+                       help='Base SQLite de la cola de crawl (default: scraped_output/crawl_queue.db)')
+    parser.add_argument('--nuevo-plan',
+                       action='store_true',
+                       help='Descartar unidades terminadas de crawls anteriores en lugar de reanudar')
+    parser.add_argument('--cola',
+                       choices=['sqlite', 'mongo'],
+                       default='sqlite',
+                       help='Cola de trabajo: sqlite (local) o mongo (compartida entre nodos)')
+    parser.add_argument('--worker',
+                       action='store_true',
+                       help='Solo procesar trabajos ya planificados en la cola (modo distribuido)')
+    parser.add_argument('--espera',
+                       type=float,
+                       default=0,
+                       help='En modo worker, segundos a esperar trabajo nuevo con la cola vacía')
+    parser.add_argument('--http-cache',
+                       choices=list(CACHE_MODES),
+                       default=None,
+                       help='Caché HTTP de los scrapers: off, on u offline (default: $ARRYN_HTTP_CACHE u off)')
+    parser.add_argument('--browser-pool',
+                       type=int,
+                       default=None,
+                       help='Navegadores headless compartidos para scrapers con navegador (default: $ARRYN_BROWSER_POOL_SIZE o 0)')
     
     args = parser.parse_args()
     
@@ -296,11 +838,20 @@ def main():
     scrapers_list = [s.strip() for s in args.scrapers.split(',')]
     
     # Ejecutar orchestrator
-    orchestrator = ScraperOrchestrator()
-    resultado = orchestrator.ejecutar_multiple(scrapers_list, args.paginas)
+    orchestrator = ScraperOrchestrator(http_cache=args.http_cache, browser_pool_size=args.browser_pool)
+    if args.worker:
+        resultado = orchestrator.ejecutar_worker(args.cola, args.queue_db, args.espera)
+    elif args.categorias:
+        categorias_list = [c.strip() for c in args.categorias.split(',') if c.strip()]
+        resultado = orchestrator.ejecutar_plan(
+            scrapers_list, categorias_list, args.paginas,
+            queue_db=args.queue_db, nuevo_plan=args.nuevo_plan, cola=args.cola
+        )
+    else:
+        resultado = orchestrator.ejecutar_multiple(scrapers_list, args.paginas)
     
     # Exit code basado en éxito
-    exit_code = 0 if resultado["scrapers_ejecutados"] > 0 else 1
+    exit_code = 0 if resultado["scrapers_ejecutados"] > 0 or resultado.get("plan_completo") else 1
     sys.exit(exit_code)
 
 if __name__ == "__main__":
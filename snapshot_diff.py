@@ -0,0 +1,275 @@
+"""
+Comparación de snapshots de productos en memoria acotada
+
+Fuentes soportadas:
+  - Manifiestos del almacén deduplicado (*.manifest.gz): ordenados por _id y
+    con el hash de cada documento, así que los documentos iguales ni se leen
+  - Backups JSON clásicos ({"backup_info": ..., "documents": [...]}), leídos
+    en streaming
+  - La colección en vivo (ordenada por _id desde MongoDB)
+
+Si ambas fuentes vienen ordenadas por _id se unen con un merge en una sola
+pasada. Si no, ambas se particionan por hash de _id en archivos temporales y
+cada partición se une con un índice en memoria, de modo que la memoria
+depende del tamaño de una partición y no del snapshot completo.
+"""
+
+import heapq
+import json
+import os
+import tempfile
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+
+from backup_store import VOLATILE_FIELDS, BackupStore, document_hash
+from json_stream import iter_json_key_array
+
+logger = logging.getLogger(__name__)
+
+# Campos que cambian en cada carga y no representan un cambio del producto
+# (los mismos que el almacén deja fuera del hash)
+DEFAULT_IGNORED_FIELDS = VOLATILE_FIELDS
+# Campos de precio (esquema actual y esquema anterior de los backups)
+PRICE_FIELDS = ('precio_valor', 'price')
+DEFAULT_PARTITIONS = 64
+TOP_PRICE_CHANGES = 20
+
+# (_id, huella del documento, documento o None si se carga bajo demanda)
+Record = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+class UnsortedSourceError(Exception):
+    """La fuente declarada como ordenada no lo está"""
+
+
+class SnapshotSource:
+    """
+    Fuente de documentos para comparar
+
+    Args:
+        records: Función que devuelve un iterador nuevo de Record
+        is_sorted: True si los registros vienen ordenados por _id
+        loader: Función huella → documento para registros sin documento
+        name: Nombre para reportes
+    """
+
+    def __init__(self, records: Callable[[], Iterator[Record]], is_sorted: bool,
+                 loader: Optional[Callable[[str], Dict[str, Any]]] = None, name: str = ''):
+        self.records = records
+        self.is_sorted = is_sorted
+        self.loader = loader
+        self.name = name
+
+    def document(self, fingerprint: str, doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return doc if doc is not None else self.loader(fingerprint)
+
+    @classmethod
+    def from_manifest(cls, manifest_path: str, store: BackupStore) -> 'SnapshotSource':
+        def records():
+            _, entries = store.read_manifest(manifest_path)
+            for doc_id, doc_hash in entries:
+                yield doc_id, doc_hash, None
+        return cls(records, True, store.get_document, manifest_path)
+
+    @classmethod
+    def from_backup_file(cls, backup_path: str) -> 'SnapshotSource':
+        def records():
+            with open(backup_path, 'r', encoding='utf-8') as f:
+                for doc in iter_json_key_array(f, 'documents'):
+                    yield str(doc.get('_id')), document_hash(doc), doc
+        return cls(records, False, None, backup_path)
+
+    @classmethod
+    def from_documents(cls, documents: Callable[[], Iterator[Dict[str, Any]]], is_sorted: bool,
+                       name: str) -> 'SnapshotSource':
+        """Fuente a partir de documentos ya convertidos a JSON (p.ej. un cursor)"""
+        def records():
+            for doc in documents():
+                yield str(doc.get('_id')), document_hash(doc), doc
+        return cls(records, is_sorted, None, name)
+
+
+def _check_sorted(records: Iterator[Record], name: str) -> Iterator[Record]:
+    previous = None
+    for record in records:
+        if previous is not None and record[0] <= previous:
+            raise UnsortedSourceError(f"{name} is not sorted by _id ({previous!r} -> {record[0]!r})")
+        previous = record[0]
+        yield record
+
+
+def _merge_join(left: SnapshotSource, right: SnapshotSource) -> Iterator[Tuple[str, Optional[Record], Optional[Record]]]:
+    """Unir dos fuentes ordenadas por _id en una pasada"""
+    a_iter = _check_sorted(left.records(), left.name)
+    b_iter = _check_sorted(right.records(), right.name)
+    a = next(a_iter, None)
+    b = next(b_iter, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield a[0], a, None
+            a = next(a_iter, None)
+        elif a is None or b[0] < a[0]:
+            yield b[0], None, b
+            b = next(b_iter, None)
+        else:
+            yield a[0], a, b
+            a = next(a_iter, None)
+            b = next(b_iter, None)
+
+
+def _partition(source: SnapshotSource, directory: str, prefix: str, partitions: int) -> List[str]:
+    """Repartir los registros de una fuente en archivos por hash de _id"""
+    paths = [os.path.join(directory, f"{prefix}_{i}.jsonl") for i in range(partitions)]
+    files = [open(p, 'w', encoding='utf-8') for p in paths]
+    try:
+        for record in source.records():
+            bucket = zlib.crc32(record[0].encode('utf-8')) % partitions
+            files[bucket].write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+def _hash_join(left: SnapshotSource, right: SnapshotSource,
+               partitions: int) -> Iterator[Tuple[str, Optional[Record], Optional[Record]]]:
+    """Unir dos fuentes sin orden usando particiones por hash en disco"""
+    with tempfile.TemporaryDirectory(prefix='arryn_diff_') as tmp:
+        left_parts = _partition(left, tmp, 'a', partitions)
+        right_parts = _partition(right, tmp, 'b', partitions)
+
+        for left_path, right_path in zip(left_parts, right_parts):
+            index: Dict[str, Record] = {}
+            with open(left_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    record = tuple(json.loads(line))
+                    index[record[0]] = record
+            with open(right_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    b = tuple(json.loads(line))
+                    a = index.pop(b[0], None)
+                    yield b[0], a, b
+            for doc_id, a in index.items():
+                yield doc_id, a, None
+
+
+def _field_changes(old: Dict[str, Any], new: Dict[str, Any], ignored: Tuple[str, ...]) -> Dict[str, Any]:
+    """Campos distintos entre dos versiones de un documento"""
+    changes = {}
+    for field in set(old) | set(new):
+        if field in ignored:
+            continue
+        if old.get(field) != new.get(field):
+            changes[field] = {"old": old.get(field), "new": new.get(field)}
+    return changes
+
+
+def _price_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    for field in PRICE_FIELDS:
+        before, after = old.get(field), new.get(field)
+        if isinstance(before, (int, float)) and isinstance(after, (int, float)) and before != after:
+            return {
+                "field": field,
+                "old": before,
+                "new": after,
+                "delta": after - before,
+                "pct": round((after - before) / before * 100, 2) if before else None
+            }
+    return None
+
+
+def diff_snapshots(left: SnapshotSource, right: SnapshotSource, output_path: Optional[str] = None,
+                   ignored_fields: Tuple[str, ...] = DEFAULT_IGNORED_FIELDS,
+                   partitions: int = DEFAULT_PARTITIONS) -> Dict[str, Any]:
+    """
+    Comparar dos snapshots por _id
+
+    Args:
+        left: Snapshot anterior
+        right: Snapshot posterior (o la colección en vivo)
+        output_path: Si se indica, escribe un JSONL con cada cambio
+        ignored_fields: Campos que no cuentan como cambio
+        partitions: Particiones para el hash join
+
+    Returns:
+        Resumen con conteos de agregados, eliminados, cambiados y sin cambios,
+        frecuencia de campos cambiados y los mayores cambios de precio
+    """
+    summary = {
+        "left": left.name,
+        "right": right.name,
+        "method": None,
+        "added": 0,
+        "removed": 0,
+        "changed": 0,
+        "unchanged": 0,
+        "changed_fields": {},
+        "price_changes": 0,
+        "top_price_changes": []
+    }
+    top: List[Tuple[float, str, Dict[str, Any]]] = []
+    out = open(output_path, 'w', encoding='utf-8') if output_path else None
+
+    def emit(entry: Dict[str, Any]):
+        if out is not None:
+            out.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+
+    def run(joined):
+        for doc_id, a, b in joined:
+            if a is None:
+                summary["added"] += 1
+                emit({"_id": doc_id, "change": "added"})
+            elif b is None:
+                summary["removed"] += 1
+                emit({"_id": doc_id, "change": "removed"})
+            elif a[1] == b[1]:
+                summary["unchanged"] += 1
+            else:
+                old = left.document(a[1], a[2])
+                new = right.document(b[1], b[2])
+                changes = _field_changes(old, new, ignored_fields)
+                if not changes:
+                    summary["unchanged"] += 1
+                    continue
+                summary["changed"] += 1
+                for field in changes:
+                    summary["changed_fields"][field] = summary["changed_fields"].get(field, 0) + 1
+                price = _price_delta(old, new)
+                if price is not None:
+                    summary["price_changes"] += 1
+                    entry = (abs(price["delta"]), doc_id, price)
+                    if len(top) < TOP_PRICE_CHANGES:
+                        heapq.heappush(top, entry)
+                    else:
+                        heapq.heappushpop(top, entry)
+                emit({"_id": doc_id, "change": "changed", "fields": changes, "price": price})
+
+    try:
+        if left.is_sorted and right.is_sorted:
+            try:
+                summary["method"] = "merge"
+                run(_merge_join(left, right))
+            except UnsortedSourceError as e:
+                # Reiniciar con hash join: los conteos parciales se descartan
+                logger.warning(f"⚠️ {e}; falling back to hash join")
+                for key in ("added", "removed", "changed", "unchanged", "price_changes"):
+                    summary[key] = 0
+                summary["changed_fields"] = {}
+                top.clear()
+                if out is not None:
+                    out.seek(0)
+                    out.truncate()
+                summary["method"] = "hash"
+                run(_hash_join(left, right, partitions))
+        else:
+            summary["method"] = "hash"
+            run(_hash_join(left, right, partitions))
+    finally:
+        if out is not None:
+            out.close()
+
+    summary["top_price_changes"] = [
+        {"_id": doc_id, **price} for _, doc_id, price in sorted(top, reverse=True)
+    ]
+    return summary
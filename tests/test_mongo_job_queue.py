@@ -0,0 +1,119 @@
+"""
+Leases de MongoJobQueue contra mongomock: toma, renovación por heartbeat y
+recuperación de trabajos cuyo lease venció
+
+Requiere mongomock (pip install mongomock); sin él las pruebas se omiten.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import mongo_job_queue
+from crawl_queue import expand_plan
+from mongo_job_queue import MongoJobQueue
+
+LEASE_SECONDS = 60
+
+
+class Clock:
+    """Reloj controlable para mongo_job_queue._now"""
+
+    def __init__(self):
+        # Sin zona horaria: mongomock, como pymongo por defecto, devuelve fechas naive
+        self.now = datetime(2026, 1, 1, 12, 0, 0)
+
+    def __call__(self) -> datetime:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += timedelta(seconds=seconds)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(mongo_job_queue, "_now", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(clock):
+    collection = mongomock.MongoClient().db.scrape_jobs
+    queue = MongoJobQueue(collection, lease_seconds=LEASE_SECONDS, max_attempts=2)
+    queue.add_units(expand_plan(["alkosto", "exito"], ["televisores"], 3))
+    return queue
+
+
+def test_lease_claims_each_job_once(queue):
+    first = queue.lease("host-a:1")
+    second = queue.lease("host-b:2")
+
+    assert first is not None and second is not None
+    assert {first["retailer"], second["retailer"]} == {"alkosto", "exito"}
+    assert first["status"] == "leased" and first["attempts"] == 1
+    assert first["lease_owner"] == "host-a:1"
+    assert queue.lease("host-c:3") is None
+    assert queue.stats() == {"leased": 2}
+
+
+def test_add_units_is_idempotent(queue):
+    assert queue.add_units(expand_plan(["alkosto", "exito"], ["televisores"], 3)) == 0
+    assert queue.stats() == {"pending": 2}
+
+
+def test_heartbeat_extends_lease(queue, clock):
+    unit = queue.lease("host-a:1")
+
+    clock.advance(LEASE_SECONDS - 10)
+    assert queue.heartbeat(unit["id"], "host-a:1")
+    doc = queue.collection.find_one({"_id": unit["id"]})
+    assert doc["lease_expires"] == clock.now + timedelta(seconds=LEASE_SECONDS)
+
+    # Vencido según el lease original, pero vigente tras el heartbeat
+    clock.advance(20)
+    other = queue.lease("host-b:2")
+    assert other is not None and other["id"] != unit["id"]
+    assert queue.lease("host-b:2") is None
+
+    assert not queue.heartbeat(unit["id"], "host-b:2")
+
+
+def test_expired_lease_is_reclaimed(queue, clock):
+    leased = {queue.lease("host-a:1")["id"], queue.lease("host-a:1")["id"]}
+    assert queue.lease("host-b:2") is None
+
+    clock.advance(LEASE_SECONDS + 1)
+    reclaimed = queue.lease("host-b:2")
+
+    assert reclaimed["id"] in leased
+    assert reclaimed["lease_owner"] == "host-b:2"
+    assert reclaimed["attempts"] == 2
+
+    # El dueño anterior perdió el lease: ni heartbeat ni complete lo afectan
+    assert not queue.heartbeat(reclaimed["id"], "host-a:1")
+    queue.complete(reclaimed["id"], "stale.json", owner="host-a:1")
+    assert queue.collection.find_one({"_id": reclaimed["id"]})["status"] == "leased"
+
+    queue.complete(reclaimed["id"], "out.json", {"total": 3}, owner="host-b:2")
+    doc = queue.collection.find_one({"_id": reclaimed["id"]})
+    assert doc["status"] == "done" and doc["output_file"] == "out.json"
+    assert "lease_owner" not in doc
+
+
+def test_expired_lease_fails_after_max_attempts(queue, clock):
+    queue.lease("host-a:1")
+    queue.lease("host-a:1")
+
+    clock.advance(LEASE_SECONDS + 1)
+    queue.lease("host-b:2")
+    queue.lease("host-b:2")
+
+    clock.advance(LEASE_SECONDS + 1)
+    assert queue.lease("host-c:3") is None
+    assert queue.stats() == {"failed": 2}
+    doc = queue.collection.find_one({})
+    assert doc["last_error"] == "lease expired"
+    assert "lease_owner" not in doc
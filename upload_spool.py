@@ -0,0 +1,207 @@
+"""
+Spool local de escritura anticipada para cargas a MongoDB
+
+Cuando Atlas no está disponible (o responde demasiado lento) los productos se
+agregan a segmentos JSONL en disco en lugar de perderse. Cada línea lleva su
+checksum CRC32 y cada lote se sincroniza con un único fsync. Más tarde un
+drainer reproduce los segmentos en bloque; como la escritura en MongoDB es
+un upsert por _id, reproducir dos veces el mismo segmento es inofensivo.
+
+Formato de cada línea:  <crc32 hex>\\t{"c": "<colección>", "p": {...producto...}}
+
+Cada proceso escribe su propio segmento activo y lo mantiene bloqueado con
+flock; el drainer solo procesa segmentos que puede bloquear, es decir, los
+que ningún proceso está escribiendo.
+
+Los productos que MongoDB rechaza al drenar (documento inválido, error de
+escritura) no se pierden con el segmento: se copian a un segmento failed_*.jsonl
+del mismo formato, con el error en la clave "e". El drainer no los reintenta;
+renombrarlo a segment_*.jsonl lo vuelve a poner en cola.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPOOL_DIR = 'spool'
+DEFAULT_SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+DRAIN_BATCH_SIZE = 500
+
+
+def _encode_record(collection_name: str, producto: Dict[str, Any], error: Optional[str] = None) -> bytes:
+    record = {"c": collection_name, "p": producto}
+    if error is not None:
+        record["e"] = error
+    payload = json.dumps(record, ensure_ascii=False,
+                         separators=(',', ':'), default=str).encode('utf-8')
+    return b'%08x\t%s\n' % (zlib.crc32(payload), payload)
+
+
+def _decode_record(line: bytes) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Decodificar una línea; None si está truncada o corrupta"""
+    if not line.endswith(b'\n'):
+        return None
+    try:
+        crc, payload = line.rstrip(b'\n').split(b'\t', 1)
+        if int(crc, 16) != zlib.crc32(payload):
+            return None
+        record = json.loads(payload)
+        return record["c"], record["p"]
+    except (ValueError, KeyError):
+        return None
+
+
+class UploadSpool:
+    """
+    Spool segmentado y append-only de productos pendientes de subir
+    """
+
+    def __init__(self, spool_dir: Optional[str] = None,
+                 segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES):
+        self.spool_dir = Path(spool_dir or os.getenv('UPLOAD_SPOOL_DIR', DEFAULT_SPOOL_DIR))
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.segment_max_bytes = segment_max_bytes
+        self._active = None
+        self._active_path = None
+        # append y seal pueden llamarse desde el hilo drainer del uploader
+        self._lock = threading.Lock()
+
+    def _open_segment(self):
+        name = f"segment_{time.time_ns():020d}_{os.getpid()}.jsonl"
+        self._active_path = self.spool_dir / name
+        self._active = open(self._active_path, 'ab')
+        # Mantener el segmento bloqueado mientras este proceso lo escribe
+        fcntl.flock(self._active, fcntl.LOCK_EX)
+
+    def append(self, productos: List[Dict[str, Any]], collection_name: str) -> int:
+        """
+        Agregar un lote de productos al spool con un solo fsync
+
+        Returns:
+            Número de productos guardados
+        """
+        if not productos:
+            return 0
+        data = b''.join(_encode_record(collection_name, p) for p in productos)
+
+        with self._lock:
+            if self._active is None:
+                self._open_segment()
+            self._active.write(data)
+            self._active.flush()
+            os.fsync(self._active.fileno())
+
+            if self._active.tell() >= self.segment_max_bytes:
+                self._seal_locked()
+        return len(productos)
+
+    def seal(self):
+        """Cerrar el segmento activo para que pueda drenarse"""
+        with self._lock:
+            self._seal_locked()
+
+    def _seal_locked(self):
+        if self._active is not None:
+            fcntl.flock(self._active, fcntl.LOCK_UN)
+            self._active.close()
+            self._active = None
+            self._active_path = None
+
+    def segments(self) -> List[Path]:
+        return sorted(self.spool_dir.glob('segment_*.jsonl'))
+
+    def pending_bytes(self) -> int:
+        return sum(p.stat().st_size for p in self.segments())
+
+    def has_pending(self) -> bool:
+        return any(p.stat().st_size > 0 for p in self.segments())
+
+    @staticmethod
+    def _iter_batches(f, batch_size: int) -> Iterator[Tuple[str, List[Dict[str, Any]], int]]:
+        """Leer un segmento agrupando productos consecutivos de la misma colección"""
+        batch: List[Dict[str, Any]] = []
+        current = None
+        corrupt = 0
+        for line in f:
+            record = _decode_record(line)
+            if record is None:
+                corrupt += 1
+                continue
+            collection_name, producto = record
+            if batch and (collection_name != current or len(batch) >= batch_size):
+                yield current, batch, corrupt
+                batch, corrupt = [], 0
+            current = collection_name
+            batch.append(producto)
+        if batch or corrupt:
+            yield current, batch, corrupt
+
+    def drain(self, writer: Callable[[List[Dict[str, Any]], str], Any],
+              batch_size: int = DRAIN_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Reproducir los segmentos cerrados con writer(productos, colección)
+
+        Un segmento se elimina solo cuando todos sus lotes se procesaron. Si
+        writer lanza una excepción el drenado se detiene y el segmento queda
+        para el próximo intento. Si writer devuelve estadísticas con 'failed'
+        (posición en el lote, error), esos productos se cuentan en 'errors' y
+        se copian a un segmento failed_* antes de eliminar el original.
+        """
+        self.seal()
+        stats = {"segments": 0, "replayed": 0, "corrupt": 0, "errors": 0}
+        failed_out = None
+
+        for path in self.segments():
+            with open(path, 'rb') as f:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Otro proceso lo está escribiendo o drenando
+                if os.fstat(f.fileno()).st_nlink == 0:
+                    continue  # Ya drenado por otro proceso
+
+                for collection_name, batch, corrupt in self._iter_batches(f, batch_size):
+                    stats["corrupt"] += corrupt
+                    if not batch:
+                        continue
+                    result = writer(batch, collection_name)
+                    failed = result.get("failed", []) if isinstance(result, dict) else []
+                    stats["replayed"] += len(batch) - len(failed)
+                    if failed:
+                        stats["errors"] += len(failed)
+                        if failed_out is None:
+                            failed_out = self._open_failed_segment()
+                        failed_out.write(b''.join(
+                            _encode_record(collection_name, batch[position], str(error))
+                            for position, error in failed
+                        ))
+                        # Persistir antes de eliminar el segmento original
+                        failed_out.flush()
+                        os.fsync(failed_out.fileno())
+
+                path.unlink()
+                stats["segments"] += 1
+
+        if failed_out is not None:
+            failed_out.close()
+            logger.error(f"❌ Spool: {stats['errors']} products could not be written, "
+                         f"kept in {failed_out.name} (rename to segment_*.jsonl to retry)")
+        if stats["corrupt"]:
+            logger.warning(f"⚠️ Spool: {stats['corrupt']} corrupt records skipped")
+        if stats["segments"]:
+            logger.info(f"📤 Spool drained: {stats['replayed']} products from {stats['segments']} segments")
+        return stats
+
+    def _open_failed_segment(self):
+        return open(self.spool_dir / f"failed_{time.time_ns():020d}_{os.getpid()}.jsonl", 'ab')
+
+    def close(self):
+        self.seal()